@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+# Time the array evaluation of the ZaBe2019 BH-NS remnant fits on a set of
+# random NSBH samples against the previous implementation, which coerced every
+# input with np.vectorize(float), and against evaluating samples one at a time.
+
+import re
+import time
+import types
+import optparse
+import numpy as np
+
+from gwemlightcurves.EjectaFits import ZaBe2019
+
+def parse_commandline():
+    """
+    Parse the options given on the command-line.
+    """
+    parser = optparse.OptionParser()
+
+    parser.add_option("-n","--nsamples",default=1000000,type=int)
+    parser.add_option("--nloop",default=1000,type=int)
+    parser.add_option("--seed",default=1,type=int)
+
+    opts, args = parser.parse_args()
+
+    return opts
+
+def reference_module():
+    """
+    ZaBe2019 with the input coercion of the previous implementation,
+    np.vectorize(float)(np.array(x)) in place of np.asarray(x, dtype=float)
+    """
+    source = open(ZaBe2019.__file__.replace(".pyc",".py")).read()
+    source = re.sub(r"np\.asarray\((\w+), dtype=float\)", r"np.vectorize(float)(np.array(\1))", source)
+    module = types.ModuleType("ZaBe2019_reference")
+    exec(compile(source, "ZaBe2019_reference", "exec"), module.__dict__)
+    return module
+
+# Parse command line
+opts = parse_commandline()
+
+ZaBe2019_reference = reference_module()
+
+np.random.seed(opts.seed)
+m1 = np.random.uniform(3.0,10.0,opts.nsamples)
+m2 = np.random.uniform(1.1,2.0,opts.nsamples)
+chi1 = np.random.uniform(0.0,0.99,opts.nsamples)
+lam = np.random.uniform(0.0,2000.0,opts.nsamples)
+beta = np.random.uniform(0.0,180.0,opts.nsamples)
+momega_0 = 0.025*np.ones(opts.nsamples)
+
+fits = [("BHNS_mass_aligned", (m1, m2, chi1, lam)),
+        ("BHNS_mass_precessing", (m1, m2, chi1, lam, beta)),
+        ("BHNS_spin_aligned", (m1, m2, chi1, lam)),
+        ("BHNS_spin_precessing", (m1, m2, chi1, lam, beta, momega_0)),
+        ("BHNS_luminosity", (m1, m2, chi1, lam))]
+
+idx = np.random.choice(opts.nsamples, opts.nloop, replace=False)
+for name, args in fits:
+    func = getattr(ZaBe2019, name)
+    func_reference = getattr(ZaBe2019_reference, name)
+
+    tic = time.time()
+    vals = np.array(func(*args))
+    toc_array = time.time() - tic
+
+    tic = time.time()
+    vals_reference = np.array(func_reference(*args))
+    toc_reference = time.time() - tic
+
+    tic = time.time()
+    vals_loop = np.array([np.array(func(*[arg[[ii]] for arg in args]))[...,0] for ii in idx]).T
+    toc_loop = (time.time() - tic)*opts.nsamples/float(opts.nloop)
+
+    maxdiff_reference = np.max(np.abs(vals - vals_reference))
+    maxdiff_loop = np.max(np.abs(vals[...,idx] - vals_loop))
+    print("%s: %d samples in %.3f s (np.vectorize(float): %.3f s, one at a time: %.1f s extrapolated), max difference %.2e vs np.vectorize(float), %.2e vs one at a time" % (name, opts.nsamples, toc_array, toc_reference, toc_loop, maxdiff_reference, maxdiff_loop))
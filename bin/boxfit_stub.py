@@ -0,0 +1,31 @@
+#!/usr/bin/python
+
+# Stand-in for the BOXFit executable, for testing BOXFit.lightcurve without
+# an MPI/BOXFit install, e.g.
+# BOXFit.lightcurve(boxfitDir,...,command="python /path/to/bin/boxfit_stub.py")
+# Reads boxfitsettings.txt from the working directory and writes a power-law
+# light curve to stdout in the BOXFit output format (i, t [s], nu [Hz], F [mJy]).
+
+import numpy as np
+
+settings = {}
+for line in open("boxfitsettings.txt").readlines():
+    line = line.split("!")[0]
+    if not "=" in line: continue
+    key, val = line.split("=")[:2]
+    try:
+        settings[key.strip()] = float(val)
+    except ValueError:
+        settings[key.strip()] = val.strip()
+
+nu = settings.get("nu_0", 1e14)
+E = settings.get("E", 1e52)
+n = settings.get("n", 1.0)
+p = settings.get("p", 2.5)
+theta_obs = settings.get("theta_obs", 0.0)
+
+t = np.logspace(np.log10(0.1*86400.0), np.log10(100.0*86400.0), 50)
+F = 1e-3*(E/1e52)*np.sqrt(n)*(t/86400.0)**(-3.0*(p-1)/4.0)*(nu/1e14)**(-(p-1)/2.0)*np.exp(-theta_obs)
+
+for ii in range(len(t)):
+    print("%d, %.10e, %.10e, %.10e" % (ii, t[ii], nu, F[ii]))
@@ -0,0 +1,28 @@
+#!/usr/bin/python
+
+# Compile kilonova model grid directories (e.g. ../output/kasen_kilonova_grid)
+# into the grid.npz files read by the SVD training routines.
+
+import os, sys
+import optparse
+
+from gwemlightcurves import lightcurve_utils
+
+def parse_commandline():
+    """
+    Parse the options given on the command-line.
+    """
+    parser = optparse.OptionParser()
+
+    parser.add_option("-g","--gridDirs",default="../output/kasen_kilonova_grid")
+
+    opts, args = parser.parse_args()
+
+    return opts
+
+# Parse command line
+opts = parse_commandline()
+
+for gridDir in opts.gridDirs.split(","):
+    gridfile = lightcurve_utils.compile_grid(gridDir)
+    print("Compiled %s to %s" % (gridDir, gridfile))
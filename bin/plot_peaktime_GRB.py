@@ -56,7 +56,7 @@ samples = data_out[grb]["KN_samples"]
 samples['tini'] = tini
 samples['tmax'] = tmax
 samples['dt'] = dt
-data_out[grb]["KN_model"] = KNTable.model('Ka2017', samples, **kwargs)
+data_out[grb]["KN_model"] = KNTable.model_cached('Ka2017', samples, dataDirKN, **kwargs)
 data_out[grb]["KN_peak"] = lightcurve_utils.get_peak(data_out[grb]["KN_model"])
 
 peak_time_H, peak_mag_H = data_out[grb]["KN_peak"]["H"][:,0], data_out[grb]["KN_peak"]["H"][:,1]
@@ -33,6 +33,7 @@ def parse_commandline():
 
     parser.add_option("--doFixZPT0",  action="store_true", default=False)
     parser.add_option("--doWaveformExtrapolate",  action="store_true", default=False)
+    parser.add_option("--doFluxBands",  action="store_true", default=False)
 
     parser.add_option("--doGWs",  action="store_true", default=False)
     parser.add_option("--doEvent",  action="store_true", default=False)
@@ -150,6 +151,7 @@ Global.T0Range = T0Range
 Global.doLightcurves = 1
 Global.filters = filters
 Global.doWaveformExtrapolate = opts.doWaveformExtrapolate
+Global.doFluxBands = opts.doFluxBands
 
 loglikes = {}
 maxloglike = -np.inf
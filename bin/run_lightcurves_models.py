@@ -22,7 +22,7 @@ import corner
 import pymultinest
 from gwemlightcurves.sampler import *
 from gwemlightcurves.KNModels import KNTable
-from gwemlightcurves.sampler import run
+from gwemlightcurves.sampler import run, schedule
 from gwemlightcurves import __version__
 from gwemlightcurves import lightcurve_utils, ztf_utils, Global
 
@@ -53,6 +53,7 @@ def parse_commandline():
     parser.add_option("--doFixZPT0",  action="store_true", default=False) 
     parser.add_option("--doFitSigma",  action="store_true", default=False)
     parser.add_option("--doWaveformExtrapolate",  action="store_true", default=False)
+    parser.add_option("--doFluxBands",  action="store_true", default=False)
     parser.add_option("--doEOSFit",  action="store_true", default=False)
     parser.add_option("--doBNSFit",  action="store_true", default=False)
     parser.add_option("-m","--model",default="KaKy2016")
@@ -64,6 +65,8 @@ def parse_commandline():
     parser.add_option("--tmin",default=0.05,type=float)
     parser.add_option("--dt",default=0.05,type=float)
     parser.add_option("--n_live_points",default=100,type=int)
+    parser.add_option("--sampler",default="multinest",help="multinest or batch")
+    parser.add_option("--batch_size",default=0,type=int)
     parser.add_option("--evidence_tolerance",default=0.5,type=float)
     parser.add_option("--max_iter",default=0,type=int)
 
@@ -78,6 +81,10 @@ def parse_commandline():
 
     parser.add_option("--username",default="username")
     parser.add_option("--password",default="password")
+    parser.add_option("--ztfCacheDir",default=None)
+    parser.add_option("--eventCacheDir",default=None)
+    parser.add_option("--nprocs",default=1,type=int)
+    parser.add_option("--svd_method",default="full",type="choice",choices=["full","truncated","randomized"])
 
     opts, args = parser.parse_args()
 
@@ -179,7 +186,7 @@ else:
 
 if opts.doZTF:
     if not os.path.isfile(filename):
-        ztf_utils.get_ztf(filename,opts.name,opts.username,opts.password)
+        ztf_utils.get_ztf(filename,opts.name,opts.username,opts.password,cacheDir=opts.ztfCacheDir)
 
 errorbudget = opts.errorbudget
 mint = opts.tmin
@@ -337,7 +344,13 @@ if opts.doModels or opts.doGoingTheDistance or opts.doMassGap or opts.doFixedLim
 
 else:
     if opts.doEvent:
-        data_out = lightcurve_utils.loadEvent(filename)
+        eventCacheDir = opts.eventCacheDir
+        if eventCacheDir is None:
+            eventCacheDir = os.path.join(opts.outputDir,"events")
+        if not os.path.isdir(eventCacheDir):
+            os.makedirs(eventCacheDir)
+        cachefile = os.path.join(eventCacheDir,"%s.npz"%opts.name)
+        data_out = lightcurve_utils.loadEvent(filename,cachefile=cachefile)
     else:
         data_out = lightcurve_utils.loadLightcurves(filename)
         if not opts.name in data_out:
@@ -404,6 +417,9 @@ Global.T0Range = T0Range
 Global.doLightcurves = 1
 Global.filters = filters
 Global.doWaveformExtrapolate = opts.doWaveformExtrapolate
+Global.doFluxBands = opts.doFluxBands
+Global.nprocs = opts.nprocs
+Global.svd_method = opts.svd_method
 
 if opts.doFixXlan:
     Global.Xlan = np.log10(opts.Xlan)
@@ -414,95 +430,8 @@ if opts.doFixT:
 if opts.doFixXlan:
     Global.phi = opts.phi
 
-if opts.model in ["Ka2017", "Ka2017inc", "Ka2017_A", "Ka2017x2", "Ka2017x2inc", "Ka2017x3", "Ka2017x3inc", "Ka2017_TrPi2018", "Ka2017_TrPi2018_A", "Bu2019", "Bu2019inc", "Bu2019inc_TrPi2018", "Bu2019lf", "Bu2019lr","Bu2019rp","Bu2019rps"]:
-    ModelPath = '%s/svdmodels'%(opts.outputDir)
-
-    if opts.model == "Bu2019":
-        modelfile = os.path.join(ModelPath,'Bu2019_phi%d_mag.pkl' % opts.phi)
-        with open(modelfile, 'rb') as handle:
-            svd_mag_model = pickle.load(handle)
-        Global.svd_mag_model = svd_mag_model    
-            
-        modelfile = os.path.join(ModelPath,'Bu2019_phi%d_lbol.pkl' % opts.phi)
-        with open(modelfile, 'rb') as handle:
-            svd_lbol_model = pickle.load(handle)
-        Global.svd_lbol_model = svd_lbol_model
-    elif opts.model in ["Bu2019inc","Bu2019inc_TrPi2018"]:
-        modelfile = os.path.join(ModelPath,'Bu2019inc_mag.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_mag_model = pickle.load(handle)
-        Global.svd_mag_model = svd_mag_model    
-            
-        modelfile = os.path.join(ModelPath,'Bu2019inc_lbol.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_lbol_model = pickle.load(handle)
-        Global.svd_lbol_model = svd_lbol_model
-    elif opts.model == "Bu2019lf":
-        modelfile = os.path.join(ModelPath,'Bu2019lf_mag.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_mag_model = pickle.load(handle)
-        Global.svd_mag_model = svd_mag_model
-
-        modelfile = os.path.join(ModelPath,'Bu2019lf_lbol.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_lbol_model = pickle.load(handle)
-        Global.svd_lbol_model = svd_lbol_model
-    elif opts.model == "Bu2019lr":
-        modelfile = os.path.join(ModelPath,'Bu2019lr_mag.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_mag_model = pickle.load(handle)
-        Global.svd_mag_model = svd_mag_model
-
-        modelfile = os.path.join(ModelPath,'Bu2019lr_lbol.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_lbol_model = pickle.load(handle)
-        Global.svd_lbol_model = svd_lbol_model
-    elif opts.model == "Bu2019rp":
-        modelfile = os.path.join(ModelPath,'Bu2019rp_mag.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_mag_model = pickle.load(handle)
-        Global.svd_mag_model = svd_mag_model
-
-        modelfile = os.path.join(ModelPath,'Bu2019rp_lbol.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_lbol_model = pickle.load(handle)
-        Global.svd_lbol_model = svd_lbol_model
-    elif opts.model == "Bu2019rps":
-        modelfile = os.path.join(ModelPath,'Bu2019rps_mag.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_mag_model = pickle.load(handle)
-        Global.svd_mag_model = svd_mag_model
-
-        modelfile = os.path.join(ModelPath,'Bu2019rps_lbol.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_lbol_model = pickle.load(handle)
-        Global.svd_lbol_model = svd_lbol_model
-    else:
-        modelfile = os.path.join(ModelPath,'Ka2017_mag.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_mag_model = pickle.load(handle)
-        Global.svd_mag_model = svd_mag_model    
-    
-        modelfile = os.path.join(ModelPath,'Ka2017_lbol.pkl')
-        with open(modelfile, 'rb') as handle:
-            svd_lbol_model = pickle.load(handle)
-        Global.svd_lbol_model = svd_lbol_model
-
-    if opts.model in ["Ka2017inc"]:
-        modelfile = os.path.join(ModelPath,'%s.pkl' % colormodel)
-        with open(modelfile, 'rb') as handle:
-            svd_mag_color_model = pickle.load(handle)
-        Global.svd_mag_color_model = svd_mag_color_model
-    elif opts.model in ["Ka2017x2inc","Ka2017x3inc"]:
-        Global.svd_mag_color_models = []
-        for colorm in colormodel:
-            if colorm == "a1.0":
-                Global.svd_mag_color_models.append("a1.0")
-            else:
-                modelfile = os.path.join(ModelPath,'%s.pkl' % colorm)
-                with open(modelfile, 'rb') as handle:
-                    svd_mag_color_model = pickle.load(handle)
-                Global.svd_mag_color_models.append(svd_mag_color_model)
+ModelPath = '%s/svdmodels'%(opts.outputDir)
+schedule.load_svd_model(opts.model, ModelPath, phi=opts.phi, colormodel=colormodel)
 
 data, tmag, lbol, mag, t0_best, zp_best, n_params, labels, best = run.multinest(opts,plotDir)
 truths = lightcurve_utils.get_truths(opts.name,opts.model,n_params,opts.doEjecta)
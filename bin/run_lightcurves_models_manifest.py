@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+# Fit a manifest of (event, model, filters, errorbudget) jobs in one process
+# pool, loading each surrogate once. Completed jobs are skipped on restart.
+#
+# Example manifest line:
+# name=GRB150101B model=Ka2017 filters=r,i T0=57023.1 distance=570 tmin=0 tmax=10 errorbudget=0.25 doEjecta=1 doFixZPT0=1
+
+import os, sys
+import optparse
+import numpy as np
+
+from gwemlightcurves.sampler import schedule
+
+def parse_commandline():
+    """
+    Parse the options given on the command-line.
+    """
+    parser = optparse.OptionParser()
+
+    parser.add_option("-m","--manifest",default="../lightcurves/manifest.txt")
+    parser.add_option("-n","--nprocs",default=1,type=int)
+    parser.add_option("--doGRB",  action="store_true", default=False)
+    parser.add_option("--grbfile",default="../lightcurves/GRB.dat")
+    parser.add_option("--models",default="Ka2017")
+    parser.add_option("--errorbudgets",default="0.10,0.25,1.00")
+
+    opts, args = parser.parse_args()
+
+    return opts
+
+# Parse command line
+opts = parse_commandline()
+
+if opts.doGRB:
+    # one job per GRB, model and error budget, as in the condor wrapper
+    jobs = []
+    lines = [line.rstrip('\n') for line in open(opts.grbfile)]
+    for line in lines:
+        lineSplit = line.split(" ")
+        grb, filts = lineSplit[0], lineSplit[1]
+        mjd, dist = float(lineSplit[2]), float(lineSplit[3])
+        if np.isnan(dist): continue
+        if grb in ["GW170817"]:
+            tmin, tmax = 0.0, 14.0
+        else:
+            tmin, tmax = 0.0, 10.0
+        for model in opts.models.split(","):
+            for errorbudget in opts.errorbudgets.split(","):
+                jobs.append({"name": grb, "model": model, "filters": filts,
+                             "T0": mjd, "distance": dist, "tmin": tmin,
+                             "tmax": tmax, "errorbudget": float(errorbudget),
+                             "doEjecta": True, "doFixZPT0": True})
+else:
+    jobs = schedule.read_manifest(opts.manifest)
+
+plotDirs = schedule.run_jobs(jobs, nprocs=opts.nprocs)
+for plotDir in plotDirs:
+    print(plotDir)
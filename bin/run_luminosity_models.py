@@ -52,6 +52,10 @@ def parse_commandline():
     parser.add_option("--tmin",default=0.05,type=float)
     parser.add_option("--dt",default=0.05,type=float)
     parser.add_option("--n_live_points",default=100,type=int)
+    parser.add_option("--sampler",default="multinest",help="multinest or batch")
+    parser.add_option("--batch_size",default=0,type=int)
+    parser.add_option("--nprocs",default=1,type=int)
+    parser.add_option("--svd_method",default="full",type="choice",choices=["full","truncated","randomized"])
 
     opts, args = parser.parse_args()
 
@@ -242,6 +246,8 @@ Global.errorbudget = errorbudget
 Global.ZPRange = ZPRange
 Global.T0Range = T0Range
 Global.doLuminosity = 1
+Global.nprocs = opts.nprocs
+Global.svd_method = opts.svd_method
 
 if opts.model == "Ka2017" or opts.model == "Ka2017x2":
     ModelPath = '%s/svdmodels'%(opts.outputDir)
@@ -78,6 +78,8 @@ def parse_commandline():
 
     parser.add_option("--doComparison",  action="store_true", default=False)
     parser.add_option("--comparisonFile",default="../output/kasen_kilonova_grid/knova_d1_n10_m0.050_vk0.20_fd1.0_Xlan1e-3.0.dat") 
+    parser.add_option("--nprocs",default=1,type=int)
+    parser.add_option("--svd_method",default="full",type="choice",choices=["full","truncated","randomized"])
 
     opts, args = parser.parse_args()
  
@@ -86,6 +88,9 @@ def parse_commandline():
 # Parse command line
 opts = parse_commandline()
 
+Global.nprocs = opts.nprocs
+Global.svd_method = opts.svd_method
+
 boxfitDir = opts.boxfitDir
 
 m1 = opts.m1
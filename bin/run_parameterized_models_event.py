@@ -2,10 +2,6 @@
 
 # ---- Import standard modules to the python path.
 
-import healpy as hp
-import itertools
-from ligo.skymap.io import fits
-from ligo.skymap.distance import parameters_to_marginal_moments, parameters_to_moments
 import os, sys, copy
 import glob
 import numpy as np
@@ -24,7 +20,7 @@ import matplotlib.pyplot as plt
 from matplotlib.pyplot import cm
 import matplotlib.gridspec as gridspec
 
-from gwemlightcurves import lightcurve_utils
+from gwemlightcurves import lightcurve_utils, skymap_utils, Global
 from gwemlightcurves.KNModels import KNTable
 from gwemlightcurves import __version__
 
@@ -81,8 +77,12 @@ def parse_commandline():
     parser.add_argument("--skymap_distance", type=str) 
     parser.add_argument("--sigma_ra", type=float, default=6.8)
     parser.add_argument("--sigma_dec", type=float, default=6.8)
+    parser.add_argument("--skymap_level", type=float, default=None)
+    parser.add_argument("--skymap_method", type=str, default="grid", choices=["grid","polygon"])
     parser.add_argument("--waveform", type=str)
     parser.add_argument("--twixie_flag", default = False, action='store_true')  
+    parser.add_argument("--nprocs", type=int, default=1)
+    parser.add_argument("--svd_method", type=str, default="full", choices=["full","truncated","randomized"])
 
     args = parser.parse_args()
  
@@ -92,46 +92,12 @@ def parse_commandline():
 #we introduce skymaps
 opts = parse_commandline()
 
-if (opts.skymap_distance):
-        skymap, metadata = fits.read_sky_map(opts.skymap_distance, nest=False, distances=True)
-        nside = hp.npix2nside(len(skymap[0]))
-        npix = len(skymap[0])
-
-        map_struct = {}
-        map_struct["prob"] = skymap[0]
-        map_struct["distmu"] = skymap[1]
-        map_struct["distsigma"] = skymap[2]
-
-        
-        ipix_best = np.argmax(skymap[0])
-        theta_best, phi_best = hp.pix2ang(nside, ipix_best)
-        ra_best = np.rad2deg(phi_best)
-        dec_best = np.rad2deg(0.5 * np.pi - theta_best)
-      
-        
-
-        ra_vector = np.linspace(ra_best - opts.sigma_ra, ra_best + opts.sigma_ra, 400)
-        dec_vector = np.linspace(dec_best - opts.sigma_dec, dec_best + opts.sigma_dec, 400)
-
-        theta_vector = 0.5 * np.pi - np.deg2rad(dec_vector)
-        phi_vector = np.deg2rad(ra_vector)
-        theta_phi_array = list(itertools.product(theta_vector, phi_vector))
-        ipix_vector = [0] * (len(theta_phi_array))
-
-        for i in range(len(theta_phi_array)):
-                ipix_vector[i] = hp.ang2pix(nside, theta_phi_array[i][0], theta_phi_array[i][1])
-        ipix_vector = list(set(ipix_vector))
-
-        all_index = [index for index, value in enumerate(map_struct["prob"])]
-        bad_index = list( set(all_index) - set(ipix_vector))
-
-        map_struct["prob"][bad_index] = 0
-        map_struct["prob"] = map_struct["prob"] / np.sum(map_struct["prob"])
-
-        distmean, diststd = parameters_to_marginal_moments(map_struct["prob"], map_struct["distmu"], map_struct["distsigma"])
-
-
+Global.nprocs = opts.nprocs
+Global.svd_method = opts.svd_method
 
+if (opts.skymap_distance):
+        map_struct = skymap_utils.read_skymap(opts.skymap_distance)
+        map_struct, distmean, diststd = skymap_utils.select_skymap(map_struct, sigma_ra=opts.sigma_ra, sigma_dec=opts.sigma_dec, level=opts.skymap_level, method=opts.skymap_method)
 
 def get_legend(model):
 
@@ -421,11 +387,10 @@ if (opts.analysisType == "posterior") or (opts.analysisType == "mchirp"):
 
         samples['q'] = 1.0 / samples['q']
 
-        from gwemlightcurves.EjectaFits.KrFo2019 import calc_meje, calc_vave
-        # calc the mass of ejecta
-       
-        
-        mej2 = calc_meje(samples['q'],samples['chi_eff'],samples['c2'], samples['m2'])
+        from gwemlightcurves.EjectaFits.KrFo2019 import calc_ejecta, calc_vave
+        # calc the mass of ejecta, only for the NSBH samples
+        mej2 = np.zeros(samples['m1'].shape)
+        mdyn2, mwind2, mej2[idx2] = calc_ejecta(samples['q'][idx2],samples['chi_eff'][idx2],samples['c2'][idx2], samples['m2'][idx2])
         # calc the velocity of ejecta
         vej2 = calc_vave(samples['q'])
        
@@ -41,6 +41,8 @@ def parse_commandline():
     parser.add_option("--doGWs",  action="store_true", default=False)
     parser.add_option("--doEvent",  action="store_true", default=False)
     parser.add_option("--doAbsorption",  action="store_true", default=False)
+    parser.add_option("--doJointSpec",  action="store_true", default=False)
+    parser.add_option("--doSparseLikelihood",  action="store_true", default=False)
     parser.add_option("--doSplit",  action="store_true", default=False)
     parser.add_option("--distance",default=40.0,type=float)
     #parser.add_option("--T0",default="1,2,3,4,5,6,7")
@@ -51,6 +53,8 @@ def parse_commandline():
     parser.add_option("--errorbudget",default=2.0,type=float)
     parser.add_option("--lambdamax",default=25000,type=int)
     parser.add_option("--lambdamin",default=5000,type=int)
+    parser.add_option("--nprocs",default=1,type=int)
+    parser.add_option("--svd_method",default="full",type="choice",choices=["full","truncated","randomized"])
 
     opts, args = parser.parse_args()
 
@@ -244,8 +248,16 @@ def Ka2017_model_spec_ejecta(mej,vej,Xlan):
 
     return t, lambdas, spec
 
+speclike = None
+
 def calc_prob_spec(t, lambdas, spec, t0, zp):
 
+    if opts.doSparseLikelihood:
+        global speclike
+        if speclike is None:
+            speclike = SpecLikelihood(data_out, t, lambdas, errorbudget=opts.errorbudget, doAbsorption=Global.doAbsorption)
+        return speclike(spec, t0, zp)
+
     count = 0
     chisquare = np.nan
 
@@ -351,6 +363,10 @@ spectraDir = opts.spectraDir
 
 if opts.doAbsorption:
     Global.doAbsorption = 1
+if opts.doJointSpec:
+    Global.doJointSpec = 1
+Global.nprocs = opts.nprocs
+Global.svd_method = opts.svd_method
 
 ModelPath = '%s/svdmodels'%(opts.outputDir)
 if not os.path.isdir(ModelPath):
@@ -1,47 +1,99 @@
-
 import os, sys
+import shutil, subprocess, tempfile
+from multiprocessing.pool import ThreadPool
 import numpy as np
 from scipy.interpolate import interpolate as interp
 import scipy
 
-def lightcurve(boxfitDir,tini,tmax,dt,theta_0,E,n,theta_obs,p,epsilon_B,epsilon_E,ksi_N):
+filts = ["u","g","r","i","z","y","J","H","K"]
+lambdas = np.array([3561.8,4866.46,6214.6,6389.4,7127.0,7544.6,8679.5,9633.3,12350.0,16620.0,21590.0])*1e-10
+nu_0s = 3e8/lambdas[:len(filts)]
+
+# light curves keyed on (boxfitDir, tini, tmax, dt, physical parameters)
+cache = {}
+cache_size = 256
+
+def render_settings(exampleIni,boxfitDir,nu_0,theta_0,E,n,theta_obs,p,epsilon_B,epsilon_E,ksi_N):
+    """
+    Fill in the boxfit.ini template for one frequency
+    """
+    ini = []
+    for line in open(exampleIni).readlines():
+         line = line.replace("xxx_boxfitDir",boxfitDir)
+         line = line.replace("xxx_nu0","%.5e"%nu_0)
+         line = line.replace("xxx_theta0","%.5f"%theta_0)
+         line = line.replace("xxx_E","%.5e"%E)
+         line = line.replace("xxx_n","%.5f"%n)
+         line = line.replace("xxx_theta_obs","%.5f"%theta_obs)
+         line = line.replace("xxx_p","%.5f"%p)
+         line = line.replace("xxx_epsilon_B","%.5e"%epsilon_B)
+         line = line.replace("xxx_epsilon_E","%.5e"%epsilon_E)
+         line = line.replace("xxx_ksi_N","%.5f"%ksi_N)
+         ini.append(line)
+    return "".join(ini)
+
+def run_boxfit(args):
+    """
+    Run BOXFit on one settings file in its own scratch directory and
+    return the light curve (t [days], mag)
+    """
+    settings, command = args
+
+    runDir = tempfile.mkdtemp(prefix="boxfit_")
+    try:
+        paramFile = os.path.join(runDir,"boxfitsettings.txt")
+        open(paramFile,'w').write(settings)
+        filename = os.path.join(runDir,"out")
+        with open(filename,'w') as fid:
+            subprocess.call(command, shell=True, cwd=runDir, stdout=fid)
+        data_out = np.loadtxt(filename,delimiter=",")
+    finally:
+        shutil.rmtree(runDir, ignore_errors=True)
+
+    t = data_out[:,1]/86400.0
+    mJy = data_out[:,3]
+    Jy = 1e-3 * mJy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mag_d = -48.6 + -1*np.log10(Jy/1e23)*2.5
+
+    return t, mag_d
+
+def lightcurve(boxfitDir,tini,tmax,dt,theta_0,E,n,theta_obs,p,epsilon_B,epsilon_E,ksi_N,nprocs=1,command=None):
+    """
+    BOXFit light curves in the filters above. Each frequency runs in its own
+    temporary directory, so runs may overlap, with up to nprocs at a time.
+    command defaults to "mpiexec <boxfitDir>/boxfit" and is run from the
+    scratch directory; any program reading boxfitsettings.txt and writing
+    the BOXFit output to stdout can be used instead (e.g. bin/boxfit_stub.py).
+    """
+
+    if command is None:
+        command = "mpiexec %s/boxfit"%(os.path.abspath(boxfitDir))
+
+    key = (os.path.abspath(boxfitDir),tini,tmax,dt,theta_0,E,n,theta_obs,p,epsilon_B,epsilon_E,ksi_N,command)
+    if key in cache:
+        tt, lbol, mag = cache[key]
+        return tt.copy(), lbol.copy(), [m.copy() for m in mag]
 
     tt = np.arange(tini,tmax,dt)
     lbol = 1e43*np.ones(tt.shape)
 
-    filts = ["u","g","r","i","z","y","J","H","K"]
-    lambdas = np.array([3561.8,4866.46,6214.6,6389.4,7127.0,7544.6,8679.5,9633.3,12350.0,16620.0,21590.0])*1e-10
-    nu_0s = 3e8/lambdas
-
     exampleIni = "%s/boxfit.ini"%boxfitDir
-    mag = []
+    args = []
     for filt, nu_0 in zip(filts,nu_0s):
-        ini = []
-        for line in open(exampleIni).readlines():
-             line = line.replace("xxx_boxfitDir",boxfitDir)
-             line = line.replace("xxx_nu0","%.5e"%nu_0)
-             line = line.replace("xxx_theta0","%.5f"%theta_0)
-             line = line.replace("xxx_E","%.5e"%E)
-             line = line.replace("xxx_n","%.5f"%n)
-             line = line.replace("xxx_theta_obs","%.5f"%theta_obs)
-             line = line.replace("xxx_p","%.5f"%p)
-             line = line.replace("xxx_epsilon_B","%.5e"%epsilon_B)
-             line = line.replace("xxx_epsilon_E","%.5e"%epsilon_E)
-             line = line.replace("xxx_ksi_N","%.5f"%ksi_N)
-             ini.append(line)
-        paramFile = "boxfitsettings.txt" 
-        open(paramFile,'w').write("".join(ini))
-        system_command = "mpiexec %s/boxfit > %s/out"%(boxfitDir,boxfitDir)
-        os.system(system_command)
-
-        filename = "%s/out"%(boxfitDir)
-        data_out = np.loadtxt(filename,delimiter=",")
- 
-        t = data_out[:,1]/86400.0
-        mJy = data_out[:,3]
-        Jy = 1e-3 * mJy
-        mag_d = -48.6 + -1*np.log10(Jy/1e23)*2.5
+        settings = render_settings(exampleIni,os.path.abspath(boxfitDir),nu_0,theta_0,E,n,theta_obs,p,epsilon_B,epsilon_E,ksi_N)
+        args.append((settings, command))
 
+    if nprocs > 1:
+        pool = ThreadPool(min(nprocs,len(args)))
+        results = pool.map(run_boxfit, args)
+        pool.close()
+        pool.join()
+    else:
+        results = [run_boxfit(arg) for arg in args]
+
+    mag = []
+    for t, mag_d in results:
         ii = np.where(np.isfinite(mag_d))[0]
         if len(ii) >= 2:
             f = interp.interp1d(t[ii], mag_d[ii], fill_value='extrapolate')
@@ -51,5 +103,8 @@ def lightcurve(boxfitDir,tini,tmax,dt,theta_0,E,n,theta_obs,p,epsilon_B,epsilon_
 
         mag.append(maginterp)
 
-    return tt, lbol, mag
+    if len(cache) >= cache_size:
+        del cache[next(iter(cache))]
+    cache[key] = (tt, lbol, mag)
 
+    return tt.copy(), lbol.copy(), [m.copy() for m in mag]
@@ -4,8 +4,9 @@
 
 import numpy as np
 import scipy
+from gwemlightcurves.EjectaFits.KaKy2016 import r_isco_table
 
-def calc_meje(q,chi_eff,c,mb,mns):
+def calc_meje(q,chi_eff,c,mb,mns,use_table=False):
 
     a1= 0.007116
     a2=0.001436
@@ -14,7 +15,12 @@ def calc_meje(q,chi_eff,c,mb,mns):
     n2=1.6840
 
     tmp1=(1-2*c)*(q**n1)*a1;
-    tmp2=-a2*(q**n2)*(r_isco(chi_eff))
+    if use_table:
+        rISCO=r_isco_table(chi_eff)
+    else:
+        rISCO=r_isco(chi_eff)
+
+    tmp2=-a2*(q**n2)*rISCO
     tmp3=a3
 
     meje_fit=mb*np.maximum(tmp1+tmp2+tmp3,0)
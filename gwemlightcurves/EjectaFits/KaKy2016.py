@@ -5,7 +5,7 @@
 import numpy as np
 import scipy
 
-def calc_meje(q,chi_eff,c,mb,mns):
+def calc_meje(q,chi_eff,c,mb,mns,use_table=False):
 
     a1=-2.269e-3
     a2=4.464e-2 
@@ -14,7 +14,12 @@ def calc_meje(q,chi_eff,c,mb,mns):
     n1=1.352
     n2=0.2497
 
-    tmp1=r_isco(chi_eff)*(q**n1)*a1;
+    if use_table:
+        rISCO=r_isco_table(chi_eff)
+    else:
+        rISCO=r_isco(chi_eff)
+
+    tmp1=rISCO*(q**n1)*a1;
     tmp2=(q**n2)*(1-2*c)*a2/c
     tmp3=(1-mns/mb)*a3+a4
 
@@ -29,3 +34,22 @@ def r_isco(chi):
   z1=1+((1-chi*chi)**(1/3.0))*(((1+chi)**(1/3.0))+(1-chi)**(1/3.0))
   z2=(3*chi*chi+z1*z1)**(1/2.0)
   return 3+z2-np.sign(chi)*((3-z1)*(3+z1+2*z2))**(1/2.0)
+
+# chi -> R_ISCO lookup tables, built on first use
+r_isco_tables = {}
+
+def r_isco_table(chi, nchi=20001):
+    """
+    R_ISCO by linear interpolation in a table of r_isco on a uniform grid of
+    nchi spins in [-1, 1]. Like r_isco, gives NaN for NaN spins or spins
+    outside [-1, 1].
+    """
+    if not nchi in r_isco_tables:
+        r_isco_tables[nchi] = r_isco(np.linspace(-1.0,1.0,nchi))
+    riscos = r_isco_tables[nchi]
+    chi = np.asarray(chi, dtype=float)
+    valid = np.isfinite(chi) & (np.abs(chi) <= 1.0)
+    x = (np.where(valid,chi,0.0)+1.0)*(nchi-1)/2.0
+    ii = np.minimum(x.astype(int), nchi-2)
+    w = x - ii
+    return np.where(valid, riscos[ii]*(1-w) + riscos[ii+1]*w, np.nan)
@@ -8,6 +8,7 @@ from pylab import pi,arange,zeros,sin,cos,exp,log,sqrt,linalg,linspace,log10
 from pylab import figure,clf,rcParams,FixedLocator,subplot,contourf,contour,axis,scatter
 from numpy import sign,sqrt
 from scipy.optimize import brentq
+from gwemlightcurves.EjectaFits.KaKy2016 import r_isco_table
 
 def CfromLambda(Lambda):
     return 0.371-0.0391*log(Lambda)+0.001056*log(Lambda)**2
@@ -18,38 +19,62 @@ def Risco(chi):
     Z2 = sqrt(3.*chi**2+Z1**2.)
     return 3.+Z2-sign(chi)*sqrt((3.-Z1)*(3.+Z1+2.*Z2))
 
-def DiskModelEtaPow(Q,C,chi,a,b,c,d):
-    rISCO = Risco(chi)
+def DiskModelEtaPow(Q,C,chi,a,b,c,d,rISCO=None):
+    if rISCO is None:
+        rISCO = Risco(chi)
     eta = Q/(1.+Q)**2.
     mass = (a*(eta)**(-1./3.)*(1.-2.*C)-b*(rISCO/eta*C)+c)
     mass = np.array(mass)
     mass[mass<0] = 0.
     return mass**(1.+d)
 
-def FHN18RemnantMass(Q,C,chi):
-    return DiskModelEtaPow(Q,C,chi,0.40642158,0.13885773,0.25512517,0.761250847)
+def FHN18RemnantMass(Q,C,chi,rISCO=None):
+    return DiskModelEtaPow(Q,C,chi,0.40642158,0.13885773,0.25512517,0.761250847,rISCO=rISCO)
 
-def FoucartEjecta(Q,C,chi):
+def FoucartEjecta(Q,C,chi,rISCO=None):
     a1 = 7.11595154e-03
     a2 = 1.43636803e-03
     a4 = -2.76202990e-02
     n1 = 8.63604211e-01
     n2 = 1.68399507e+00
-    rISCO = Risco(chi)
+    if rISCO is None:
+        rISCO = Risco(chi)
     Mej = a1*Q**n1*(1.-2*C)/C-a2*Q**n2*rISCO+a4
     Mej = np.array(Mej)
     Mej[Mej<0] = 0.
     return Mej
 
-def calc_meje(q,chi_eff,c,mns,f=0.15):
+def calc_ejecta(q,chi_eff,c,mns,f=0.15,use_table=False):
+    """
+    Dynamical, wind and total ejecta masses in a single pass. R_ISCO and the
+    Foucart ejecta are computed once per sample and shared; with use_table,
+    R_ISCO comes from a precomputed lookup table.
+    """
+
+    q = np.asarray(q, dtype=float)
+    chi_eff = np.asarray(chi_eff, dtype=float)
+    c = np.asarray(c, dtype=float)
+    mns = np.asarray(mns, dtype=float)
+
+    if use_table:
+        rISCO = r_isco_table(chi_eff)
+    else:
+        rISCO = Risco(chi_eff)
 
     mb = mns*(1+0.6*c/(1.-0.5*c))
-    mdyn = FoucartEjecta(q,c,chi_eff)*mb
-    mwind = f*(FHN18RemnantMass(q,c,chi_eff)-FoucartEjecta(q,c,chi_eff))*mb
+    mfoucart = FoucartEjecta(q,c,chi_eff,rISCO=rISCO)
+    mdyn = mfoucart*mb
+    mwind = f*(FHN18RemnantMass(q,c,chi_eff,rISCO=rISCO)-mfoucart)*mb
     mwind = np.array(mwind)
     mwind[mwind<0] = 0.0
     mtot = mdyn+mwind
 
+    return mdyn, mwind, mtot
+
+def calc_meje(q,chi_eff,c,mns,f=0.15,use_table=False):
+
+    mdyn, mwind, mtot = calc_ejecta(q,chi_eff,c,mns,f=f,use_table=use_table)
+
     return mtot
 
 def calc_vave(q):
@@ -28,11 +28,11 @@ def bbh_UIBfits_setup(m1, m2, chi1, chi2):
     """
     Common setup function for UIB final-state and luminosity fit functions
     """
-    # Vectorize the function if arrays are provided as input
-    m1   = np.vectorize(float)(np.array(m1))
-    m2   = np.vectorize(float)(np.array(m2))
-    chi1 = np.vectorize(float)(np.array(chi1))
-    chi2 = np.vectorize(float)(np.array(chi2))
+    # Coerce inputs to float arrays
+    m1   = np.asarray(m1, dtype=float)
+    m2   = np.asarray(m2, dtype=float)
+    chi1 = np.asarray(chi1, dtype=float)
+    chi2 = np.asarray(chi2, dtype=float)
     if np.any(m1<0):
       raise ValueError("m1 must not be negative")
     if np.any(m2<0):
@@ -51,10 +51,10 @@ def bbh_UIBfits_setup(m1, m2, chi1, chi2):
     # symmetric mass ratio
     eta  = m1*m2/msq
     if np.any(eta>0.25):
-      print "Truncating eta from above to 0.25. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs..."
+      print("Truncating eta from above to 0.25. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs...")
       eta = np.minimum(eta,0.25)
     if np.any(eta<0.0):
-      print "Truncating negative eta to 0.0. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs..."
+      print("Truncating negative eta to 0.0. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs...")
       eta = np.maximum(eta,0.0)
     eta2 = eta*eta
     eta3 = eta2*eta
@@ -276,11 +276,11 @@ def bbh_UIBfits_setup_2(m1, m2, chi1, chi2):
     """
     Common setup function for UIB final-state and luminosity fit functions
     """
-    # Vectorize the function if arrays are provided as input
-    m1   = np.vectorize(float)(np.array(m1))
-    m2   = np.vectorize(float)(np.array(m2))
-    chi1 = np.vectorize(float)(np.array(chi1))
-    chi2 = np.vectorize(float)(np.array(chi2))
+    # Coerce inputs to float arrays
+    m1   = np.asarray(m1, dtype=float)
+    m2   = np.asarray(m2, dtype=float)
+    chi1 = np.asarray(chi1, dtype=float)
+    chi2 = np.asarray(chi2, dtype=float)
     if np.any(m1<0):
       raise ValueError("m1 must not be negative")
     if np.any(m2<0):
@@ -299,10 +299,10 @@ def bbh_UIBfits_setup_2(m1, m2, chi1, chi2):
     # symmetric mass ratio
     eta  = m1*m2/msq
     if np.any(eta>0.25):
-      print "Truncating eta from above to 0.25. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs..."
+      print("Truncating eta from above to 0.25. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs...")
       eta = np.minimum(eta,0.25)
     if np.any(eta<0.0):
-      print "Truncating negative eta to 0.0. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs..."
+      print("Truncating negative eta to 0.0. This should only be necessary in some rounding corner cases, but better check your m1 and m2 inputs...")
       eta = np.maximum(eta,0.0)
     eta2 = eta*eta
     eta3 = eta2*eta
@@ -452,12 +452,12 @@ def BHNS_mass_precessing(m1, m2, chi1, lam, beta):
     beta    : angle between orb. ang. mom. and BH spin (degrees)
     """
     
-    ## Vectorization
-    m1   = np.vectorize(float)(np.array(m1))
-    m2   = np.vectorize(float)(np.array(m2))
-    chi1 = np.vectorize(float)(np.array(chi1))
-    lam  = np.vectorize(float)(np.array(lam))
-    beta = np.vectorize(float)(np.array(beta))
+    ## Coerce inputs to float arrays
+    m1   = np.asarray(m1, dtype=float)
+    m2   = np.asarray(m2, dtype=float)
+    chi1 = np.asarray(chi1, dtype=float)
+    lam  = np.asarray(lam, dtype=float)
+    beta = np.asarray(beta, dtype=float)
     
     ## Initial checks
     if np.any(m1<0):
@@ -498,11 +498,11 @@ def BHNS_mass_aligned(m1, m2, chi1, lam):
     """
 
 
-    ## Vectorization
-    m1   = np.vectorize(float)(np.array(m1))
-    m2   = np.vectorize(float)(np.array(m2))
-    chi1 = np.vectorize(float)(np.array(chi1))
-    lam  = np.vectorize(float)(np.array(lam))
+    ## Coerce inputs to float arrays
+    m1   = np.asarray(m1, dtype=float)
+    m2   = np.asarray(m2, dtype=float)
+    chi1 = np.asarray(chi1, dtype=float)
+    lam  = np.asarray(lam, dtype=float)
 
     ## Initial checks
     if np.any(m1<0):
@@ -552,13 +552,13 @@ def BHNS_spin_precessing(m1, m2, chi1, lam, beta, momega_0):
     momega_0: initial orbital frequency multiplied by the total mass of the binary
     """
 
-    ## Vectorization
+    ## Coerce inputs to float arrays
     degr_conv = 180./np.pi
-    m1   = np.vectorize(float)(np.array(m1))
-    m2   = np.vectorize(float)(np.array(m2))
-    chi1 = np.vectorize(float)(np.array(chi1))
-    lam  = np.vectorize(float)(np.array(lam))
-    beta = np.vectorize(float)(np.array(beta))
+    m1   = np.asarray(m1, dtype=float)
+    m2   = np.asarray(m2, dtype=float)
+    chi1 = np.asarray(chi1, dtype=float)
+    lam  = np.asarray(lam, dtype=float)
+    beta = np.asarray(beta, dtype=float)
     
     ## Initial checks
     if np.any(m1<0):
@@ -600,11 +600,11 @@ def BHNS_spin_aligned(m1, m2, chi1, lam):
     lam     : neutron star tidal polarizability 
     """
     
-    ## Vectorization
-    m1   = np.vectorize(float)(np.array(m1))
-    m2   = np.vectorize(float)(np.array(m2))
-    chi1 = np.vectorize(float)(np.array(chi1))
-    lam  = np.vectorize(float)(np.array(lam))
+    ## Coerce inputs to float arrays
+    m1   = np.asarray(m1, dtype=float)
+    m2   = np.asarray(m2, dtype=float)
+    chi1 = np.asarray(chi1, dtype=float)
+    lam  = np.asarray(lam, dtype=float)
     
     ## Initial checks
     if np.any(m1<0):
@@ -641,11 +641,11 @@ def BHNS_luminosity(m1, m2, chi1, lam):
     lam     : neutron star tidal polarizability 
     """
     
-    ## Vectorization
-    m1   = np.vectorize(float)(np.array(m1))
-    m2   = np.vectorize(float)(np.array(m2))
-    chi1 = np.vectorize(float)(np.array(chi1))
-    lam  = np.vectorize(float)(np.array(lam))
+    ## Coerce inputs to float arrays
+    m1   = np.asarray(m1, dtype=float)
+    m2   = np.asarray(m2, dtype=float)
+    chi1 = np.asarray(chi1, dtype=float)
+    lam  = np.asarray(lam, dtype=float)
     
     ## Initial checks
     if np.any(m1<0):
@@ -683,19 +683,19 @@ if __name__=='__main__':
     '''Small examples'''
  	
     ## Final BH mass for aligned BH initial spins
-    print BHNS_mass_aligned(m1, m2, chi1, lam)
+    print(BHNS_mass_aligned(m1, m2, chi1, lam))
     
     ## Final BH mass for precessing binaries
-    print BHNS_mass_precessing(m1, m2, chi1, lam, beta)
+    print(BHNS_mass_precessing(m1, m2, chi1, lam, beta))
    	
     ## Final BH spin for aligned BH initial spins
-    print BHNS_spin_aligned(m1, m2, chi1, lam)
+    print(BHNS_spin_aligned(m1, m2, chi1, lam))
     
     ## Final BH spin for precessing binaries
-    print BHNS_spin_precessing(m1, m2, chi1, lam, beta, M_omega0)
+    print(BHNS_spin_precessing(m1, m2, chi1, lam, beta, M_omega0))
 
     ## GW luminosity 
-    print BHNS_luminosity(m1, m2, chi1, lam)
+    print(BHNS_luminosity(m1, m2, chi1, lam))
 
     Xdot = BHNS_mass_aligned(m1, m2, chi1, lam)
     Egw = BHNS_luminosity(m1, m2, chi1, lam)
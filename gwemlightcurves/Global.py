@@ -18,3 +18,7 @@ svd_mag_color_model = 0
 svd_mag_color_models = []
 doWaveformExtrapolate = 0
 doAbsorption = 0
+doFluxBands = 0
+svd_method = "full"
+nprocs = 1
+doJointSpec = 0
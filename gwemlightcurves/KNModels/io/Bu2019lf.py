@@ -80,12 +80,12 @@ def get_Bu2019lf_model(table, **kwargs):
         else:
             if LoadModel:
             #if True:
-                modelfile = os.path.join(ModelPath,'Bu2019lf_spec.pkl')
+                modelfile = os.path.join(ModelPath,svd_utils.spec_model_filename('Bu2019lf'))
                 with open(modelfile, 'rb') as handle:
                     svd_spec_model = pickle.load(handle)
             else:
                 svd_spec_model = svd_utils.calc_svd_spectra(table['tini'][0], table['tmax'][0], table['dt'][0], table['lambdaini'][0], table['lambdamax'][0], table['dlambda'][0], model = "Bu2019lf", n_coeff = table['n_coeff'][0])
-                modelfile = os.path.join(ModelPath,'Bu2019lf_spec.pkl')
+                modelfile = os.path.join(ModelPath,svd_utils.spec_model_filename('Bu2019lf'))
                 with open(modelfile, 'wb') as handle:
                     pickle.dump(svd_spec_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
             Global.svd_spec_model = svd_spec_model
@@ -31,103 +31,122 @@ def get_WoKo2017_model(table, **kwargs):
     table['lbol'] = [np.zeros(timeseries.size)]
     table['mag'] =  [np.zeros([9, timeseries.size])]
 
-    # calc lightcurve for each sample
+    # calc lightcurves for all samples at once
+    t, lbol, mag = calc_lc_batch(table['tini'][0], table['tmax'][0], table['dt'][0],
+                                 np.array(table['mej']), np.array(table['vej']),
+                                 np.array(table['theta_r']), np.array(table['kappa']))
     for isample in range(len(table)):
-        table['t'][isample], table['lbol'][isample], table['mag'][isample] = calc_lc(table['tini'][isample], table['tmax'][isample],
-                                                                     table['dt'][isample], table['mej'][isample],
-                                                                     table['vej'][isample], table['theta_r'][isample], table['kappa'][isample])
+        table['t'][isample], table['lbol'][isample], table['mag'][isample] = t[isample], lbol[isample], mag[isample]
     return table
 
-def calc_lc(tini,tmax,dt,mej,vej,theta_r,kappa_r,model="DZ2"):
-
-    mejconst = [-1.13,-1.01,-0.94,-0.94,-0.93,-0.93,-0.95,-0.99]
-    vejconst = [-1.28,-1.60,-1.52,-1.56,-1.61,-1.61,-1.55,-1.33]
-    kappaconst = [2.65,2.27,2.02,1.87,1.76,1.56,1.33,1.13]
-
-    if model == "DZ2":
-        mej0 = 0.013+0.005
-        vej0 = 0.132+0.08
-        kappa0 = 1.0
-        modelfile = "../data/macronova_models_wollaeger2017/DZ2_mags_2017-03-20.dat"
-    elif model == "gamA2":
-        mej0 = 0.013+0.005
-        vej0 = 0.132+0.08
-        kappa0 = 1.0
-        modelfile = "../data/macronova_models_wollaeger2017/gamA2_mags_2017-03-20.dat"
-    elif model == "gamB2":
-        mej0 = 0.013+0.005
-        vej0 = 0.132+0.08
-        kappa0 = 1.0
-        modelfile = "../data/macronova_models_wollaeger2017/gamB2_mags_2017-03-20.dat"
-
-    data_out = np.loadtxt(modelfile)
-    ndata, nslices = data_out.shape
-    ints = np.arange(0,ndata,ndata/9)
-
-    tvec_days = np.arange(tini,tmax+dt,dt)
-    mAB = np.zeros((len(tvec_days),8))
-
-    for ii in xrange(len(ints)):
-        idx = np.arange(ndata/9) + ii*(ndata/9)
-        data_out_slice = data_out[idx,:]
-
-        t = data_out_slice[:,1]
-        data = data_out_slice[:,2:]
-        #idx = np.where((t >= 0) & (t <= 7))[0]
-        #t = t[idx]
-        #data = data[idx,:]
-        nt, nbins = data.shape
-
+modelfiles = {
+    "DZ2": "../data/macronova_models_wollaeger2017/DZ2_mags_2017-03-20.dat",
+    "gamA2": "../data/macronova_models_wollaeger2017/gamA2_mags_2017-03-20.dat",
+    "gamB2": "../data/macronova_models_wollaeger2017/gamB2_mags_2017-03-20.dat",
+}
+
+# tables and interpolation weights, loaded / computed once per process
+_tables = {}
+_time_weights = {}
+
+def load_table(model="DZ2"):
+    """
+    Read a Wollaeger et al. (2017) magnitude file into (t, bins, data), where
+    data is (9, ntimes, nbins): log10 lbol followed by the g..K magnitudes
+    """
+    if not model in _tables:
+        data_out = np.loadtxt(modelfiles[model])
+        ndata, nslices = data_out.shape
+        nt = ndata//9
+        data_out = np.reshape(data_out[:9*nt,:], (9, nt, nslices))
+
+        t = data_out[0,:,1]
+        data = data_out[:,:,2:]
+        data[0] = np.log10(data[0])
+        idx = np.argsort(t)
+        t, data = t[idx], data[:,idx,:]
+
+        nbins = data.shape[2]
         a_i = (360/(2*np.pi))*np.arccos(1 - np.arange(nbins)*2/float(nbins))
         b_i = (360/(2*np.pi))*np.arccos(1 - (np.arange(nbins)+1)*2/float(nbins))
         bins = (a_i + b_i)/2.0
 
-        idx = np.argsort(np.abs(bins-theta_r*2*np.pi))
-        idx1 = idx[0]
-        idx2 = idx[1]
-        weight1 = 1/np.abs(bins[idx1]-theta_r*2*np.pi)
-        weight2 = 1/np.abs(bins[idx1]-theta_r*2*np.pi)
-        if not np.isfinite(weight1):
-            weight1, weight2 = 1.0, 0.0
-        elif not np.isfinite(weight2):
-            weight1, weight2 = 0.0, 1.0
-        else:
-            weight1, weight2 = weight1/(weight1+weight2), weight2/(weight1+weight2)
-
-        if ii == 0:
-            #f     = scipy.interpolate.interp2d(bins,t,np.log10(data), kind='cubic')
-            f1 = interp.interp1d(t, np.log10(data[:,idx1]), fill_value='extrapolate')
-            f2 = interp.interp1d(t, np.log10(data[:,idx2]), fill_value='extrapolate')
-        else:
-            #f     = scipy.interpolate.interp2d(bins,t,data, kind='cubic')
-            f1 = interp.interp1d(t,data[:,idx1], fill_value='extrapolate')
-            f2 = interp.interp1d(t,data[:,idx2], fill_value='extrapolate')
-
-        fam1, fam2  = f1(tvec_days), f2(tvec_days)
-        fam = weight1*fam1+weight2*fam2
-
-        if ii == 0:
-            lbol = 10**fam
-        else:
-            mAB[:,int(ii-1)] = np.squeeze(fam + mejconst[int(ii-1)]*np.log10(mej/mej0) + vejconst[int(ii-1)]*np.log10(vej/vej0)) #+ kappaconst[int(ii-1)]*np.log10(kappa_r/kappa0))
+        _tables[model] = (t, bins, data)
+    return _tables[model]
+
+def get_time_weights(model, tini, tmax, dt):
+    """
+    Linear interpolation (and extrapolation) indices and weights from the
+    table times onto the output grid
+    """
+    key = (model, tini, tmax, dt)
+    if not key in _time_weights:
+        t, bins, data = load_table(model)
+        tvec_days = np.arange(tini,tmax+dt,dt)
+        jj = np.clip(np.searchsorted(t, tvec_days) - 1, 0, len(t)-2)
+        ww = (tvec_days - t[jj])/(t[jj+1] - t[jj])
+        _time_weights[key] = (tvec_days, jj, ww)
+    return _time_weights[key]
+
+def calc_lc(tini,tmax,dt,mej,vej,theta_r,kappa_r,model="DZ2"):
+
+    tvec_days, lbol, mAB = calc_lc_batch(tini,tmax,dt,mej,vej,theta_r,kappa_r,model=model)
+
+    return np.squeeze(tvec_days[0]), np.squeeze(lbol[0]), mAB[0]
+
+def calc_lc_batch(tini,tmax,dt,mej,vej,theta_r,kappa_r,model="DZ2"):
+    """
+    Light curves for arrays of (mej, vej, theta_r, kappa_r).
+    Returns t and lbol (Nsamples, Ntimes) and mag (Nsamples, 9, Ntimes).
+    """
+
+    mejconst = np.array([-1.13,-1.01,-0.94,-0.94,-0.93,-0.93,-0.95,-0.99])
+    vejconst = np.array([-1.28,-1.60,-1.52,-1.56,-1.61,-1.61,-1.55,-1.33])
+    kappaconst = np.array([2.65,2.27,2.02,1.87,1.76,1.56,1.33,1.13])
+
+    mej0 = 0.013+0.005
+    vej0 = 0.132+0.08
+    kappa0 = 1.0
+
+    mej, vej, theta_r, kappa_r = [np.atleast_1d(np.asarray(x, dtype=float)) for x in np.broadcast_arrays(mej, vej, theta_r, kappa_r)]
+    nsamples = len(mej)
+
+    t, bins, data = load_table(model)
+    tvec_days, jj, ww = get_time_weights(model, tini, tmax, dt)
+
+    # the two angular bins closest to each sample, equally weighted unless
+    # the angle falls on a bin centre
+    dist = np.abs(bins[np.newaxis,:]-theta_r[:,np.newaxis]*2*np.pi)
+    idx = np.argsort(dist, axis=1)
+    idx1, idx2 = idx[:,0], idx[:,1]
+    exact = dist[np.arange(nsamples),idx1] == 0
+    weight1 = np.where(exact, 1.0, 0.5)[np.newaxis,:,np.newaxis]
+    weight2 = np.where(exact, 0.0, 0.5)[np.newaxis,:,np.newaxis]
+
+    # (9, nsamples, ntimes) light curves in the two bins, interpolated in time
+    data1, data2 = data[:,:,idx1], data[:,:,idx2]
+    fam1 = (1-ww)*data1[:,jj,:].transpose(0,2,1) + ww*data1[:,jj+1,:].transpose(0,2,1)
+    fam2 = (1-ww)*data2[:,jj,:].transpose(0,2,1) + ww*data2[:,jj+1,:].transpose(0,2,1)
+    fam = weight1*fam1 + weight2*fam2
+
+    lbol = 10**fam[0]
+    mAB = fam[1:].transpose(1,0,2) + (mejconst[np.newaxis,:]*np.log10(mej/mej0)[:,np.newaxis] + vejconst[np.newaxis,:]*np.log10(vej/vej0)[:,np.newaxis])[:,:,np.newaxis] #+ kappaconst*np.log10(kappa_r/kappa0))
 
     tmax = (kappa_r/10)**0.35 * (mej/10**-2)**0.318 * (vej/0.1)**-0.60
     Lmax = 2.8*10**40 * (kappa_r/10)**-0.60 * (mej/10**-2)**0.426 * (vej/0.1)**0.776
 
-    tvec_days = tvec_days*tmax/tvec_days[np.argmax(lbol)]
-    lbol = lbol*Lmax/np.max(lbol)
+    tvec = tvec_days[np.newaxis,:]*(tmax/tvec_days[np.argmax(lbol, axis=1)])[:,np.newaxis]
+    lbol = lbol*(Lmax/np.max(lbol, axis=1))[:,np.newaxis]
 
+    # u band by linear interpolation in wavelength (clamped at the ends)
     wavelengths = [4775.6, 6129.5, 7484.6, 8657.8, 9603.1, 12350, 16620, 21590]
     wavelength_interp = 3543
+    weights = np.array([np.interp(wavelength_interp, wavelengths, row) for row in np.eye(len(wavelengths))])
+    mAB_y = np.einsum('j,ijk->ik', weights, mAB)
 
-    mAB_y = np.zeros(tvec_days.shape)
-    for ii in xrange(len(tvec_days)):
-        mAB_y[ii] = np.interp(wavelength_interp,wavelengths,mAB[ii,:])
-    mAB_new = np.zeros((len(tvec_days),9))
-    mAB_new[:,0] = np.squeeze(mAB_y)
-    mAB_new[:,1:] = mAB
+    mAB_new = np.concatenate((mAB_y[:,np.newaxis,:], mAB), axis=1)
 
-    return np.squeeze(tvec_days), np.squeeze(lbol), mAB_new.T
+    return tvec, lbol, mAB_new
 
 register_model('WoKo2017', KNTable, get_WoKo2017_model,
                  usage="table")
@@ -196,6 +196,122 @@ def get_lalsim_eos(eos_name):
 
 
 
+class Reservoir(object):
+    """
+    Streaming sample of Nsamples rows without replacement from blocks of
+    Tables, in O(Nsamples) memory. Without weights the sample is uniform;
+    with weights it follows Efraimidis & Spirakis (2006) A-ES, keeping the
+    rows with the largest keys u**(1/w) (compared as log(u)/w).
+    Rows with non-positive weight are never selected.
+    """
+    def __init__(self, Nsamples, seed=None):
+        self.Nsamples = Nsamples
+        # seed=None draws from the global numpy random state
+        self.rng = np.random if seed is None else np.random.RandomState(seed)
+        self.rows = None
+        self.keys = np.empty(0)
+
+    def add(self, block, weights=None):
+        keys = np.log(self.rng.random_sample(len(block)))
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+            with np.errstate(divide='ignore'):
+                keys = np.where(weights > 0, keys / weights, -np.inf)
+        idx = np.where(keys > -np.inf)[0]
+        if len(self.keys) > 0 and len(self.keys) == self.Nsamples:
+            idx = idx[keys[idx] > np.min(self.keys)]
+
+        if self.rows is None:
+            rows, keys = block[idx], keys[idx]
+        else:
+            rows, keys = vstack([self.rows, block[idx]]), np.concatenate((self.keys, keys[idx]))
+        if len(keys) > self.Nsamples:
+            idx = np.argpartition(-keys, self.Nsamples-1)[:self.Nsamples]
+            rows, keys = rows[idx], keys[idx]
+        self.rows, self.keys = rows, keys
+
+    def table(self):
+        """
+        The sampled rows, in decreasing key order (random order if unweighted).
+        At least one block must have been added.
+        """
+        return self.rows[np.argsort(-self.keys, kind='stable')]
+
+def iter_ascii_blocks(filename_samples, chunksize=100000):
+    """
+    Blocks of at most chunksize rows of a whitespace separated posterior
+    sample file with a (possibly commented) header line, as Tables
+    """
+    nskip = 0
+    with open(filename_samples) as fid:
+        for line in fid:
+            nskip = nskip + 1
+            if line.strip():
+                names = line.lstrip('#').split()
+                break
+
+    reader = pd.read_csv(filename_samples, sep=r'\s+', header=None, names=names,
+                         skiprows=nskip, chunksize=chunksize)
+    for block in reader:
+        yield Table([block[name].values for name in names], names=names)
+
+def iter_hdf_blocks(filename_samples, chunksize=100000):
+    """
+    Blocks of at most chunksize rows of the lalinference dataset of an
+    HDF5 posterior sample file, as Tables
+    """
+    with h5py.File(filename_samples, 'r') as f:
+        samples_out = f['lalinference']
+        for start in range(0, len(samples_out), chunksize):
+            yield Table(samples_out[start:start+chunksize])
+
+def derive_hdf_samples(data_out):
+    """
+    Add q, mchirp, eta, theta and m1/m2 to a block of LALInference HDF5 samples
+    """
+    m1, m2 = np.asarray(data_out['m1']), np.asarray(data_out['m2'])
+    q = m1 / m2
+    mchirp = (m1 * m2)**(3./5.) / (m1 + m2)**(1./5.)
+    eta = lightcurve_utils.q2eta(q)
+
+    iota = np.asarray(data_out['iota'])
+    data_out['theta'] = np.where(iota > 90., 180 - iota, iota)
+    data_out['mchirp'] = mchirp
+    data_out['eta'] = eta
+    data_out['m1'], data_out['m2'] = lightcurve_utils.mc2ms(mchirp, eta)
+    data_out['q'] = 1.0/q
+
+    return data_out
+
+def derive_ascii_samples(data_out, verbose=True):
+    """
+    Rename bilby/LALInference columns in a block of ASCII samples to
+    m1, m2, lambdat, dlambdat and dist, and add mchirp, eta, q and chi_eff
+    """
+    renames = [('mass_1_source', 'm1'), ('mass_2_source', 'm2'),
+               ('m1_detector_frame_Msun', 'm1'), ('m2_detector_frame_Msun', 'm2'),
+               ('dlam_tilde', 'dlambdat'), ('lam_tilde', 'lambdat'),
+               ('delta_lambda_tilde', 'dlambdat'), ('lambda_tilde', 'lambdat')]
+    columns = list(data_out.columns)
+    for name, newname in renames:
+        if name in columns:
+            data_out[newname] = data_out[name]
+            if verbose:
+                print('setting %s to %s' % (newname, name))
+
+    if 'm1' not in list(data_out.columns):
+        eta = lightcurve_utils.q2eta(np.asarray(data_out['mass_ratio']))
+        data_out['m1'], data_out['m2'] = lightcurve_utils.mc2ms(np.asarray(data_out["chirp_mass"]), eta)
+
+    m1, m2 = np.asarray(data_out['m1']), np.asarray(data_out['m2'])
+    mchirp, eta, q = lightcurve_utils.ms2mc(m1, m2)
+    data_out['mchirp'], data_out['eta'], data_out['q'] = mchirp, eta, 1.0/q
+    data_out['chi_eff'] = ((m1 * np.asarray(data_out['spin1']) +
+                            m2 * np.asarray(data_out['spin2'])) / (m1 + m2))
+    data_out["dist"] = data_out["luminosity_distance_Mpc"]
+
+    return data_out
+
 class KNTable(Table):
     """A container for a table of events
 
@@ -207,77 +323,40 @@ class KNTable(Table):
     """
     # -- i/o ------------------------------------
     @classmethod
-    def read_samples(cls, filename_samples):
+    def iter_samples(cls, filename_samples, chunksize=100000):
         """
-        Read LALinference posterior_samples
+        Read LALinference/bilby posterior_samples in blocks of at most
+        chunksize rows, yielding a KNTable with the derived columns of
+        read_samples for each
         """
         import os
         if not os.path.isfile(filename_samples):
             raise ValueError("Sample file supplied does not exist")
 
         if "hdf" in filename_samples:
-            samples_out = h5py.File(filename_samples, 'r')
-            samples_out = samples_out['lalinference']
-
-            data_out = Table(samples_out)
-            data_out['q'] = data_out['m1'] / data_out['m2']
-            data_out['mchirp'] = (data_out['m1'] * data_out['m2'])**(3./5.) / (data_out['m1'] + data_out['m2'])**(1./5.)
-            
-            data_out['theta'] = data_out['iota']
-            idx = np.where(data_out['theta'] > 90.)[0]
-            data_out['theta'][idx] = 180 - data_out['theta'][idx]
-
-
-            data_out["eta"] = lightcurve_utils.q2eta(data_out["q"])
-            data_out["m1"], data_out["m2"] = lightcurve_utils.mc2ms(data_out["mchirp"],data_out["eta"])
-            data_out['q'] = 1.0/data_out['q']
-
- 
+            for data_out in iter_hdf_blocks(filename_samples, chunksize=chunksize):
+                yield KNTable(derive_hdf_samples(data_out))
         else:
-            data_out = Table.read(filename_samples, format='ascii')
-    
-            if 'mass_1_source' in list(data_out.columns):
-                data_out['m1'] = data_out['mass_1_source']
-                print('setting m1 to m1_source')
-            if 'mass_2_source' in list(data_out.columns):
-                data_out['m2'] = data_out['mass_2_source']
-                print('setting m2 to m2_source')
+            for ii, data_out in enumerate(iter_ascii_blocks(filename_samples, chunksize=chunksize)):
+                yield KNTable(derive_ascii_samples(data_out, verbose=(ii == 0)))
 
-            if 'm1_detector_frame_Msun' in list(data_out.columns):
-                data_out['m1'] = data_out['m1_detector_frame_Msun']
-                print('setting m1 to m1_source')
-            if 'm2_detector_frame_Msun' in list(data_out.columns):
-                data_out['m2'] = data_out['m2_detector_frame_Msun']
-                print('setting m2 to m2_source')
+    @classmethod
+    def read_samples(cls, filename_samples, Nsamples=None, chunksize=100000, weights=None, seed=None):
+        """
+        Read LALinference posterior_samples. The file is streamed in blocks
+        of chunksize rows; with Nsamples, only a random subset of Nsamples
+        rows (weighted by the column weights, if given) is kept in memory.
+        """
+        blocks = cls.iter_samples(filename_samples, chunksize=chunksize)
 
-            if 'dlam_tilde' in list(data_out.columns):
-                data_out['dlambdat'] = data_out['dlam_tilde']
-                print('setting dlambdat to dlam_tilde')
-            if 'lam_tilde' in list(data_out.columns):
-                data_out['lambdat'] = data_out['lam_tilde']
-                print('setting lambdat to lam_tilde')   
-
-            if 'delta_lambda_tilde' in list(data_out.columns):
-                data_out['dlambdat'] = data_out['delta_lambda_tilde']
-                print('setting dlambdat to delta_lambda_tilde')
-            if 'lambda_tilde' in list(data_out.columns):
-                data_out['lambdat'] = data_out['lambda_tilde']
-                print('setting lambdat to lambda_tilde')
-
-            if 'm1' not in list(data_out.columns):
-                eta = lightcurve_utils.q2eta(data_out['mass_ratio'])
-                m1, m2 = lightcurve_utils.mc2ms(data_out["chirp_mass"], eta)
-                data_out['m1'] = m1
-                data_out['m2'] = m2
-
-            data_out['mchirp'], data_out['eta'], data_out['q'] = lightcurve_utils.ms2mc(data_out['m1'], data_out['m2'])
-            data_out['q'] = 1.0/data_out['q']
-            data_out['chi_eff'] = ((data_out['m1'] * data_out['spin1'] +
-                                       data_out['m2'] * data_out['spin2']) /
-                                      (data_out['m1'] + data_out['m2']))
-            data_out["dist"] = data_out["luminosity_distance_Mpc"] 
+        if Nsamples is None:
+            return KNTable(vstack(list(blocks)))
 
-        return KNTable(data_out)
+        reservoir = Reservoir(Nsamples, seed=seed)
+        for block in blocks:
+            reservoir.add(block, weights=None if weights is None else block[weights])
+
+        return KNTable(reservoir.table())
 
     @classmethod
     def read_mchirp_samples(cls, filename_samples, Nsamples=100, twixie_flag=False):
@@ -738,15 +817,18 @@ class KNTable(Table):
    
         return self
 
-    def downsample(self, Nsamples=100):
+    def downsample(self, Nsamples=100, weights=None, seed=None):
         """
         randomly down samples the number os posterior samples used for calculating lightcurves
-        plotting etc
+        plotting etc. weights (a column name or an array) makes the selection
+        weight-proportional, see Reservoir; seed fixes the selection
         """
         print('You are requesting to downsample the number of posterior samples to {0}'.format(Nsamples))
-        idx = np.random.permutation(len(self))
-        idx = idx[:Nsamples]
-        return self[idx]
+        if isinstance(weights, str):
+            weights = self[weights]
+        reservoir = Reservoir(Nsamples, seed=seed)
+        reservoir.add(self, weights=weights)
+        return reservoir.table()
 
     @classmethod
     def plot_mag_panels(cls, table_dict, distance, filts=["g","r","i","z","y","J","H","K"],  magidxs=[0,1,2,3,4,5,6,7,8], figsize=(20, 28)):
@@ -899,3 +981,113 @@ class KNTable(Table):
         from .io.model import get_model
         model = get_model(format_, cls)
         return model(*args, **kwargs)
+
+    @classmethod
+    def model_cached(cls, format_, table, cacheDir, **kwargs):
+        """Like `KNTable.model`, but keep the light curves on disk
+
+        Light curves are stored per (model, tini, tmax, dt, kwargs and the
+        Global surrogate settings) under cacheDir, indexed by a hash of
+        each sample's parameters. Only samples not
+        already in the cache are evaluated and appended, so re-running on
+        the same (or a grown) posterior file reuses earlier work.
+
+        Parameters
+        ----------
+        format_ : `str`
+            registered model name, as for `KNTable.model`
+        table : `KNTable`
+            samples including the tini, tmax and dt columns
+        cacheDir : `str`
+            directory holding the cache
+
+        Returns
+        -------
+        table : `KNTable`
+            the samples with t, lbol and mag columns; mag and lbol are
+            read from memory mapped arrays
+        """
+        import hashlib
+        import json
+        from gwemlightcurves import Global
+
+        if len(table) == 0:
+            return table.copy()
+
+        tini, tmax, dt = table['tini'][0], table['tmax'][0], table['dt'][0]
+        settings = {'model': format_,
+                    'tini': '%.5e' % tini, 'tmax': '%.5e' % tmax, 'dt': '%.5e' % dt,
+                    'kwargs': dict((name, repr(kwargs[name])) for name in sorted(kwargs)),
+                    'svd_method': Global.svd_method,
+                    'doJointSpec': Global.doJointSpec}
+        settings = json.dumps(settings, sort_keys=True)
+        key = hashlib.sha1(settings.encode()).hexdigest()[:16]
+        cachePath = os.path.join(cacheDir, '%s_%s' % (format_, key))
+        if not os.path.isdir(cachePath):
+            os.makedirs(cachePath)
+        settingsfile = os.path.join(cachePath, 'settings.json')
+        if os.path.isfile(settingsfile):
+            if not open(settingsfile).read() == settings:
+                raise ValueError('%s was written with different settings' % cachePath)
+        else:
+            with open(settingsfile + '.tmp', 'w') as fid:
+                fid.write(settings)
+            os.replace(settingsfile + '.tmp', settingsfile)
+        keysfile = os.path.join(cachePath, 'keys.txt')
+        magfile = os.path.join(cachePath, 'mag.dat')
+        lbolfile = os.path.join(cachePath, 'lbol.dat')
+        tfile = os.path.join(cachePath, 't.npy')
+
+        colnames = sorted([name for name in table.colnames if table[name].ndim == 1 and table[name].dtype.kind in 'biuf'])
+        params = np.ascontiguousarray(np.array([table[name] for name in colnames], dtype=float).T)
+        rowkeys = [hashlib.sha1(row.tobytes()).hexdigest() for row in params]
+
+        if os.path.isfile(keysfile):
+            # a partly written last line is not a key
+            cached = [line.rstrip('\n') for line in open(keysfile) if line.endswith('\n')]
+        else:
+            cached = []
+        index = dict(zip(cached, range(len(cached))))
+
+        missing = []
+        for ii, rowkey in enumerate(rowkeys):
+            if not rowkey in index:
+                index[rowkey] = -1
+                missing.append(ii)
+
+        if len(missing) > 0:
+            print('Computing %d of %d light curves' % (len(missing), len(table)))
+            model_table = cls.model(format_, table[missing], **kwargs)
+            mag = np.array([row['mag'] for row in model_table], dtype=float)
+            lbol = np.array([row['lbol'] for row in model_table], dtype=float)
+            if not os.path.isfile(tfile):
+                np.save(tfile, np.array(model_table['t'][0], dtype=float))
+            # data first, keys last. Rows left behind by an interrupted
+            # append have no key, so cut the data files back to the keyed
+            # rows before appending, and replace the keys file in one step.
+            for filename, data in [(magfile, mag), (lbolfile, lbol)]:
+                rowsize = data[0].nbytes
+                with open(filename, 'ab') as fid:
+                    fid.truncate(len(cached)*rowsize)
+                    fid.write(np.ascontiguousarray(data).tobytes())
+            with open(keysfile + '.tmp', 'w') as fid:
+                for rowkey in cached:
+                    fid.write('%s\n' % rowkey)
+                for ii in missing:
+                    fid.write('%s\n' % rowkeys[ii])
+            os.replace(keysfile + '.tmp', keysfile)
+            for ii in missing:
+                index[rowkeys[ii]] = len(cached)
+                cached.append(rowkeys[ii])
+
+        t = np.load(tfile)
+        ntimes = len(t)
+        mags = np.memmap(magfile, dtype=float, mode='r', shape=(len(cached), 9, ntimes))
+        lbols = np.memmap(lbolfile, dtype=float, mode='r', shape=(len(cached), ntimes))
+        idx = np.array([index[rowkey] for rowkey in rowkeys], dtype=int)
+
+        table = table.copy()
+        table['t'] = np.tile(t, (len(table), 1))
+        table['lbol'] = lbols[idx]
+        table['mag'] = mags[idx]
+        return table
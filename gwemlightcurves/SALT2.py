@@ -1,21 +1,79 @@
-
 import numpy as np
 import sncosmo
+from sncosmo.constants import HC_ERG_AA, MODEL_BANDFLUX_SPACING
+from sncosmo.utils import integration_grid
 
-def lightcurve(tini,tmax,dt,z,t0,x0,x1,c):
-    model = sncosmo.Model(source='salt2')
-    model.set(z=z, t0=t0, x0=x0,x1=x1,c=c)
+filters = ['sdssu','sdssg','sdssr','sdssi','sdssz','f1000w','f1280w','f1500w','f2100w']
+
+# sncosmo Models and band integration setup, built once per process
+models = {}
+bandsetup = {}
+
+def get_model(source='salt2'):
+    """
+    Shared sncosmo Model for source (creating one loads the source files)
+    """
+    if not source in models:
+        models[source] = sncosmo.Model(source=source)
+    return models[source]
+
+def get_bandsetup():
+    """
+    Integration weights of all filters on one wavelength grid: the union of
+    the per-band grids sncosmo uses in bandflux, so that every band follows
+    from a single flux evaluation. Returns wave, weights (nwave x nfilts),
+    the band wavelength ranges and AB zero points.
+    """
+    if not bandsetup:
+        bands = [sncosmo.get_bandpass(filt) for filt in filters]
+        grids, weights = [], []
+        for band in bands:
+            wave, dwave = integration_grid(band.minwave(), band.maxwave(), MODEL_BANDFLUX_SPACING)
+            grids.append(wave)
+            weights.append(wave * band(wave) * dwave / HC_ERG_AA)
+        wave, idx = np.unique(np.hstack(grids), return_inverse=True)
+        W = np.zeros((len(wave),len(bands)))
+        start = 0
+        for i, grid in enumerate(grids):
+            np.add.at(W[:,i], idx[start:start+len(grid)], weights[i])
+            start = start + len(grid)
+
+        ab = sncosmo.get_magsystem('ab')
+        bandsetup["wave"] = wave
+        bandsetup["weights"] = W
+        bandsetup["minwave"] = np.array([band.minwave() for band in bands])
+        bandsetup["maxwave"] = np.array([band.maxwave() for band in bands])
+        bandsetup["zp"] = np.array([ab.zpbandflux(band) for band in bands])
+    return bandsetup
+
+def lightcurve_batch(tini,tmax,dt,params,source='salt2'):
+    """
+    Light curves for an (nsamples, 5) array of (z, t0, x0, x1, c).
+    Returns t, lbol (nsamples, ntimes) and mag (nsamples, 9, ntimes);
+    filters outside the redshifted model wavelength range are NaN.
+    """
+    model = get_model(source)
+    setup = get_bandsetup()
+
+    params = np.atleast_2d(params)
     t = np.arange(tini,tmax+dt,dt)
-    mag = np.nan*np.ones((9,len(t)))
-    lbol = np.nan*np.ones((len(t),))
+    mag = np.nan*np.ones((len(params),len(filters),len(t)))
+    lbol = np.nan*np.ones((len(params),len(t)))
 
-    filters = ['sdssu','sdssg','sdssr','sdssi','sdssz','f1000w','f1280w','f1500w','f2100w']
-    for i, filt in enumerate(filters):
-        try:
-            mag[i,:] = model.bandmag(filt, 'ab', t)
-            lbol = model.bandflux(filt,t)
-        except:
-            continue 
+    for jj, (z,t0,x0,x1,c) in enumerate(params):
+        model.set(z=z, t0=t0, x0=x0,x1=x1,c=c)
+        valid = np.where((setup["minwave"] >= model.minwave()) & (setup["maxwave"] <= model.maxwave()))[0]
+        if len(valid) == 0: continue
+        iw = np.where(np.any(setup["weights"][:,valid] != 0,axis=1))[0]
+
+        flux = model.flux(t, setup["wave"][iw])
+        bandflux = np.dot(flux, setup["weights"][iw][:,valid])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mag[jj,valid,:] = (-2.5*np.log10(bandflux/setup["zp"][valid])).T
+        lbol[jj,:] = bandflux[:,-1]
 
     return t, lbol, mag
 
+def lightcurve(tini,tmax,dt,z,t0,x0,x1,c):
+    t, lbol, mag = lightcurve_batch(tini,tmax,dt,[[z,t0,x0,x1,c]])
+    return t, lbol[0], mag[0]
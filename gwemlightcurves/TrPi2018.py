@@ -1,5 +1,6 @@
 
 import os, sys
+import multiprocessing
 import numpy as np
 from scipy.interpolate import interpolate as interp
 import scipy
@@ -18,13 +19,29 @@ def fluxDensity(t, nu, jetType, specType, *Y):
     mJy = grbpy.fluxDensity(t, nu, jetType, specType, *Y)
     return mJy
 
-def lightcurve(tini,tmax,dt,theta_v, E0, theta_c, theta_w, n, p, epsilon_E, epsilon_B):
+filts = ["u","g","r","i","z","y","J","H","K"]
+lambdas = np.array([3561.8,4866.46,6214.6,6389.4,7127.0,7544.6,8679.5,9633.3,12350.0,16620.0,21590.0])*1e-10
+nu_0s = 3e8/lambdas[:len(filts)]
+
+# light curves keyed on (tini, tmax, dt, jet parameters, time grid)
+cache = {}
+cache_size = 1024
+
+def lightcurve(tini,tmax,dt,theta_v, E0, theta_c, theta_w, n, p, epsilon_E, epsilon_B, ta = 1e-1, tb = 1.0e3, nt = 10):
+    """
+    Afterglow light curve in the filters above. fluxDensity is evaluated for
+    all filters at once on nt log-spaced times between ta and tb (days),
+    then linearly interpolated onto np.arange(tini,tmax+dt,dt).
+    """
+
+    key = (tini, tmax, dt, theta_v, E0, theta_c, theta_w, n, p, epsilon_E, epsilon_B, ta, tb, nt)
+    if key in cache:
+        tt, lbol, mag = cache[key]
+        return tt.copy(), lbol.copy(), mag.copy()
 
     day = 86400.0
     tt = np.arange(tini,tmax+dt,dt)
-    ta = 1e-1 * day
-    tb = 1.0e3 * day
-    t = np.logspace(np.log10(ta), np.log10(tb), base=10.0, num=10)
+    t = np.logspace(np.log10(ta*day), np.log10(tb*day), base=10.0, num=nt)
     lbol = 1e43*np.ones(tt.shape)
 
     jetType = 0
@@ -34,31 +51,60 @@ def lightcurve(tini,tmax,dt,theta_v, E0, theta_c, theta_w, n, p, epsilon_E, epsi
 
     Y = np.array([theta_v, E0, theta_c, theta_w, n, p, epsilon_E, epsilon_B, ksiN, dL])
 
-    filts = ["u","g","r","i","z","y","J","H","K"]
-    lambdas = np.array([3561.8,4866.46,6214.6,6389.4,7127.0,7544.6,8679.5,9633.3,12350.0,16620.0,21590.0])*1e-10
-    nu_0s = 3e8/lambdas
-
-    mag = []
-    for filt, nu_0 in zip(filts,nu_0s):
-
-        nu = nu_0*np.ones(t.shape)
+    # one call for every (filter, time) pair
+    t_all = np.tile(t, len(nu_0s))
+    nu_all = np.repeat(nu_0s, len(t))
+    try:
+        mJy = fluxDensity(t_all, nu_all, jetType, specType, *Y)
+    except TimeoutException:
+        mJy = np.zeros(t_all.shape)
 
-        try:
-            mJy = fluxDensity(t, nu, jetType, specType, *Y)
-        except TimeoutException:
-            mJy = np.zeros(t.shape) 
-
-        Jy = 1e-3 * mJy
+    Jy = 1e-3 * np.reshape(mJy, (len(nu_0s), len(t)))
+    with np.errstate(divide='ignore', invalid='ignore'):
         mag_d = -48.6 + -1*np.log10(Jy/1e23)*2.5
 
-        ii = np.where(np.isfinite(mag_d))[0]
+    tdays = t/day
+    jj = np.clip(np.searchsorted(tdays, tt) - 1, 0, len(tdays)-2)
+    w = (tt-tdays[jj])/(tdays[jj+1]-tdays[jj])
+    mag = mag_d[:,jj]*(1-w) + mag_d[:,jj+1]*w
+
+    for ii_filt in np.where(~np.all(np.isfinite(mag_d),axis=1))[0]:
+        ii = np.where(np.isfinite(mag_d[ii_filt]))[0]
         if len(ii) >= 2:
-            f = interp.interp1d(t[ii]/day, mag_d[ii], fill_value='extrapolate')
-            maginterp = f(tt)
+            f = interp.interp1d(tdays[ii], mag_d[ii_filt,ii], fill_value='extrapolate')
+            mag[ii_filt] = f(tt)
         else:
-            maginterp = np.nan*np.ones(tt.shape)
-
-        mag.append(maginterp)
-
-    return tt, lbol, np.array(mag)
-
+            mag[ii_filt] = np.nan
+
+    if len(cache) >= cache_size:
+        del cache[next(iter(cache))]
+    cache[key] = (tt, lbol, mag)
+
+    return tt.copy(), lbol.copy(), mag.copy()
+
+def lightcurve_star(args):
+    tini, tmax, dt, params, kwargs = args
+    return lightcurve(tini, tmax, dt, *params, **kwargs)
+
+def lightcurve_batch(tini,tmax,dt,params,nprocs=1,**kwargs):
+    """
+    Light curves for an (nsamples, 8) array of jet parameters (theta_v, E0,
+    theta_c, theta_w, n, p, epsilon_E, epsilon_B), optionally over a pool of
+    nprocs processes. Returns tt, lbol (nsamples, ntimes) and
+    mag (nsamples, nfilts, ntimes).
+    """
+
+    args = [(tini, tmax, dt, tuple(param), kwargs) for param in np.atleast_2d(params)]
+    if nprocs > 1:
+        pool = multiprocessing.Pool(nprocs)
+        results = pool.map(lightcurve_star, args, chunksize=max(1, len(args)//(4*nprocs)))
+        pool.close()
+        pool.join()
+    else:
+        results = [lightcurve_star(arg) for arg in args]
+
+    tt = results[0][0]
+    lbol = np.array([result[1] for result in results])
+    mag = np.array([result[2] for result in results])
+
+    return tt, lbol, mag
@@ -140,11 +140,10 @@ class EM_Counterpart():
                 self.samples['mchirp'], self.samples['eta'], self.samples['q'] = lightcurve_utils.ms2mc(self.samples['m1'], self.samples['m2'])
                 self.samples['q'] = 1.0 / self.samples['q']
 
-                from gwemlightcurves.EjectaFits.KrFo2019 import calc_meje, calc_vave
-                # calc the mass of ejecta
-       
-        
-                mej2 = calc_meje(self.samples['q'], self.samples['chi_eff'], self.samples['c2'], self.samples['m2'])
+                from gwemlightcurves.EjectaFits.KrFo2019 import calc_ejecta, calc_vave
+                # calc the mass of ejecta, only for the NSBH samples
+                mej2 = np.zeros(self.samples['m1'].shape)
+                mdyn2, mwind2, mej2[idx2] = calc_ejecta(self.samples['q'][idx2], self.samples['chi_eff'][idx2], self.samples['c2'][idx2], self.samples['m2'][idx2])
                 # calc the velocity of ejecta
                 vej2 = calc_vave(self.samples['q'])
        
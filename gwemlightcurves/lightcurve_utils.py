@@ -90,22 +90,53 @@ def loadModelsLbol(outputDir,name):
 
     return Lbols
 
-def loadEvent(filename):
-    lines = [line.rstrip('\n') for line in open(filename)]
-    lines = filter(None,lines)
+def read_columns(filename,ncols,skiprows=0):
+    """
+    Whitespace separated file as an (nrows, ncols) string array, skipping
+    blank lines and any columns past ncols
+    """
+    lines = open(filename).read().splitlines()[skiprows:]
+    rows = [line.split()[:ncols] for line in lines if line.strip()]
+    if len(rows) == 0:
+        return np.empty((0,ncols),dtype=str)
+    return np.array(rows)
 
+def group_rows(keys,values):
+    """
+    Split the rows of values by key with a single stable sort. Keys come
+    out in order of first appearance and rows keep their file order.
+    """
+    ukeys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    idx = np.argsort(inverse, kind='stable')
+    counts = np.bincount(inverse, minlength=len(ukeys))
+    chunks = np.split(values[idx], np.cumsum(counts)[:-1])
+    return {str(ukeys[ii]): chunks[ii] for ii in np.argsort(first)}
+
+def loadEvent(filename,cachefile=None):
+    """
+    Event photometry (isot time, filter, mag, dmag per line) as a dict of
+    (n, 3) [mjd, mag, dmag] arrays per filter. If cachefile is given, the
+    result is saved there as .npz and reused while it is newer than filename.
+    """
+    if cachefile is not None and os.path.isfile(cachefile) and \
+        os.path.getmtime(cachefile) >= os.path.getmtime(filename):
+        with np.load(cachefile) as cache:
+            chunks = np.split(cache["data"], np.cumsum(cache["counts"])[:-1])
+            return {str(filt): chunk for filt, chunk in zip(cache["filts"],chunks)}
+
+    columns = read_columns(filename,4)
     data = {}
-    for line in lines:
-        lineSplit = line.split(" ")
-        lineSplit = list(filter(None,lineSplit))
-        mjd = Time(lineSplit[0], format='isot').mjd
-        filt = lineSplit[1]
-        mag = float(lineSplit[2])
-        dmag = float(lineSplit[3])
-
-        if not filt in data:
-            data[filt] = np.empty((0,3), float)
-        data[filt] = np.append(data[filt],np.array([[mjd,mag,dmag]]),axis=0)
+    if len(columns) > 0:
+        mjd = Time(list(columns[:,0]), format='isot').mjd
+        values = np.vstack((mjd,columns[:,2].astype(float),columns[:,3].astype(float))).T
+        data = group_rows(columns[:,1],values)
+
+    if cachefile is not None:
+        filts = list(data.keys())
+        with open(cachefile,'wb') as fid:
+            np.savez(fid, filts=np.array(filts,dtype=str),
+                     counts=np.array([len(data[filt]) for filt in filts],dtype=int),
+                     data=np.vstack([data[filt] for filt in filts]) if filts else np.empty((0,3)))
 
     return data
 
@@ -211,25 +242,15 @@ def loadEventLbol(filename):
     return data
 
 def loadLightcurves(filename):
-    lines = [line.rstrip('\n') for line in open(filename)]
-    lines = lines[1:]
-    lines = filter(None,lines)
+    columns = read_columns(filename,6,skiprows=1)
 
     data = {}
-    for line in lines:
-        lineSplit = line.split(" ")
-        numid = float(lineSplit[0])
-        psid = lineSplit[1]
-        filt = lineSplit[2]
-        mjd = float(lineSplit[3])
-        mag = float(lineSplit[4])
-        dmag = float(lineSplit[5])
-
-        if not psid in data:
-            data[psid] = {}
-        if not filt in data[psid]:
-            data[psid][filt] = np.empty((0,3), float)
-        data[psid][filt] = np.append(data[psid][filt],np.array([[mjd,mag,dmag]]),axis=0)
+    if len(columns) == 0:
+        return data
+
+    values = columns[:,3:6].astype(float)
+    for psid, idx in group_rows(columns[:,1],np.arange(len(columns))).items():
+        data[psid] = group_rows(columns[idx,2],values[idx])
 
     return data
 
@@ -348,6 +369,195 @@ def read_files_spec(files):
 
     return specs, names
 
+def get_grid_params(name):
+    """
+    Model parameters encoded in the file name of a kilonova grid file
+    """
+
+    params = {}
+    keySplit = name.split("_")
+    if keySplit[0] == "rpft":
+        params["mej"] = float("0." + keySplit[1].replace("m",""))
+        params["vej"] = float("0." + keySplit[2].replace("v",""))
+    elif keySplit[0] == "knova":
+        params["mej"] = float(keySplit[3].replace("m",""))
+        params["vej"] = float(keySplit[4].replace("vk",""))
+        if len(keySplit) == 6:
+            params["Xlan"] = 10**float(keySplit[5].replace("Xlan1e",""))
+        elif len(keySplit) == 7:
+            if "Xlan1e" in keySplit[6]:
+                params["Xlan"] = 10**float(keySplit[6].replace("Xlan1e",""))
+            elif "Xlan1e" in keySplit[5]:
+                params["Xlan"] = 10**float(keySplit[5].replace("Xlan1e",""))
+    elif keySplit[0] == "SED":
+        params["mej"], params["vej"], params["Ye"] = get_macronovae_rosswog(name)
+    elif "gamma" in name:
+        params["kappaLF"] = float(keySplit[2].replace("kappaLF",""))
+        params["gammaLF"] = float(keySplit[3].replace("gammaLF",""))
+        params["kappaLR"] = float(keySplit[4].replace("kappaLR",""))
+        params["gammaLR"] = float(keySplit[5].replace("gammaLR",""))
+        params["theta"] = float(keySplit[6])
+    elif "nsns" in name:
+        params["mej_dyn"] = float(keySplit[2].replace("mejdyn",""))
+        params["mej_wind"] = float(keySplit[3].replace("mejwind",""))
+        params["phi"] = float(keySplit[4].replace("phi",""))
+        params["theta"] = float(keySplit[5])
+    elif "mejdyn" in name:
+        params["mej_dyn"] = float(keySplit[1].replace("mejdyn",""))
+        params["mej_wind"] = float(keySplit[2].replace("mejwind",""))
+        params["phi"] = float(keySplit[4].replace("phi",""))
+        params["theta"] = float(keySplit[5])
+    elif "bluecone" in name:
+        params["mej"] = float(keySplit[2].replace("mej",""))
+        params["phi"] = 90-float(keySplit[3].replace("th",""))
+        params["theta"] = float(keySplit[4])
+    elif "redellips" in name:
+        params["mej"] = float(keySplit[2].replace("mej",""))
+        params["a"] = float(keySplit[3].replace("a",""))
+        params["theta"] = float(keySplit[4])
+    elif keySplit[0] == "nph1.0e+06":
+        params["mej"] = float(keySplit[1].replace("mej",""))
+        params["phi"] = float(keySplit[2].replace("phi",""))
+        params["theta"] = float(keySplit[3])
+    elif keySplit[0] == "kasenReprocess":
+        params["mej_1"] = float(keySplit[2].replace("mejcone",""))
+        params["mej_2"] = float(keySplit[3].replace("mejell",""))
+        params["phi"] = float(keySplit[4].replace("th",""))
+        params["a"] = float(keySplit[5].replace("a",""))
+        params["theta"] = float(keySplit[6])
+
+    return params
+
+def get_grid_files(fileDir):
+    """
+    Magnitude, Lbol and spectra files of a model grid directory
+    """
+
+    filenames_all = sorted(glob.glob('%s/*.dat'%fileDir))
+    files = {"mag": [], "lbol": [], "spec": []}
+    for filename in filenames_all:
+        if "_Lbol.dat" in filename:
+            files["lbol"].append(filename)
+        elif "_spec.dat" in filename:
+            files["spec"].append(filename)
+        else:
+            files["mag"].append(filename)
+    return files
+
+def compile_grid(fileDir, gridfile=None):
+    """
+    Parse a model grid directory once into a single binary file (default
+    fileDir/grid.npz). Each file type is stored as concatenated columns
+    with row offsets, and the file name parameters as a (names x params)
+    table with NaN for parameters a model does not have.
+    """
+
+    if gridfile is None:
+        gridfile = os.path.join(fileDir, "grid.npz")
+
+    files = get_grid_files(fileDir)
+    mags, mag_names = read_files(files["mag"])
+    lbols, lbol_names = read_files_lbol(files["lbol"])
+    specs, spec_names = read_files_spec(files["spec"])
+    filters = ["u","g","r","i","z","y","J","H","K"]
+
+    out = {}
+    out["mag_names"] = np.array(mag_names, dtype=str)
+    out["mag_offsets"] = np.cumsum([0] + [len(mags[name]["t"]) for name in mag_names])
+    out["mag_data"] = np.vstack([np.vstack([mags[name]["t"]] + [mags[name][filt] for filt in filters]).T for name in mag_names]) if mag_names else np.zeros((0,10))
+
+    out["lbol_names"] = np.array(lbol_names, dtype=str)
+    out["lbol_offsets"] = np.cumsum([0] + [len(lbols[name]["tt"]) for name in lbol_names])
+    out["lbol_data"] = np.vstack([np.vstack((lbols[name]["tt"], lbols[name]["Lbol"])).T for name in lbol_names]) if lbol_names else np.zeros((0,2))
+
+    out["spec_names"] = np.array(spec_names, dtype=str)
+    out["spec_shapes"] = np.array([specs[name]["data"].shape for name in spec_names], dtype=int).reshape(-1,2)
+    out["spec_t"] = np.concatenate([specs[name]["t"] for name in spec_names]) if spec_names else np.zeros(0)
+    out["spec_lambda"] = np.concatenate([specs[name]["lambda"] for name in spec_names]) if spec_names else np.zeros(0)
+    out["spec_data"] = np.concatenate([specs[name]["data"].ravel() for name in spec_names]) if spec_names else np.zeros(0)
+
+    names = sorted(set(mag_names) | set(lbol_names) | set(spec_names))
+    params = {}
+    for name in names:
+        try:
+            params[name] = get_grid_params(name)
+        except (ValueError, IndexError, UnboundLocalError):
+            params[name] = {}
+    param_keys = sorted(set([key for name in names for key in params[name]]))
+    param_values = np.nan*np.ones((len(names),len(param_keys)))
+    for ii, name in enumerate(names):
+        for jj, key in enumerate(param_keys):
+            if key in params[name]:
+                param_values[ii,jj] = params[name][key]
+    out["param_names"] = np.array(names, dtype=str)
+    out["param_keys"] = np.array(param_keys, dtype=str)
+    out["param_values"] = param_values
+
+    np.savez(gridfile, **out)
+
+    return gridfile
+
+def load_grid(fileDir, kind="mag", gridfile=None):
+    """
+    Load one file type ("mag", "lbol" or "spec") of a model grid in the
+    format of read_files, read_files_lbol and read_files_spec, with the
+    file name parameters added to each entry. The grid is compiled with
+    compile_grid first if the binary file is missing or out of date.
+    """
+
+    if gridfile is None:
+        gridfile = os.path.join(fileDir, "grid.npz")
+
+    files = get_grid_files(fileDir)
+    mtimes = [os.path.getmtime(filename) for kk in files for filename in files[kk]]
+    if not os.path.isfile(gridfile) or (len(mtimes) > 0 and max(mtimes) > os.path.getmtime(gridfile)):
+        compile_grid(fileDir, gridfile=gridfile)
+    grid = np.load(gridfile)
+    if len(grid["%s_names" % kind]) != len(files[kind]):
+        compile_grid(fileDir, gridfile=gridfile)
+        grid = np.load(gridfile)
+
+    names = [str(name) for name in grid["%s_names" % kind]]
+    out = {}
+    if kind == "mag":
+        filters = ["u","g","r","i","z","y","J","H","K"]
+        offsets, data = grid["mag_offsets"], grid["mag_data"]
+        for ii, name in enumerate(names):
+            mag_d = data[offsets[ii]:offsets[ii+1]]
+            out[name] = {}
+            out[name]["t"] = mag_d[:,0]
+            for jj, filt in enumerate(filters):
+                out[name][filt] = mag_d[:,jj+1]
+    elif kind == "lbol":
+        offsets, data = grid["lbol_offsets"], grid["lbol_data"]
+        for ii, name in enumerate(names):
+            out[name] = {}
+            out[name]["tt"] = data[offsets[ii]:offsets[ii+1],0]
+            out[name]["Lbol"] = data[offsets[ii]:offsets[ii+1],1]
+    elif kind == "spec":
+        shapes = grid["spec_shapes"]
+        t_offsets = np.cumsum(np.append(0, shapes[:,0]))
+        l_offsets = np.cumsum(np.append(0, shapes[:,1]))
+        d_offsets = np.cumsum(np.append(0, shapes[:,0]*shapes[:,1]))
+        # each NpzFile access re-reads the array, so read them once
+        spec_t, spec_lambda, spec_data = grid["spec_t"], grid["spec_lambda"], grid["spec_data"]
+        for ii, name in enumerate(names):
+            out[name] = {}
+            out[name]["t"] = spec_t[t_offsets[ii]:t_offsets[ii+1]]
+            out[name]["lambda"] = spec_lambda[l_offsets[ii]:l_offsets[ii+1]]
+            out[name]["data"] = np.reshape(spec_data[d_offsets[ii]:d_offsets[ii+1]], shapes[ii])
+
+    param_index = dict([(str(name), ii) for ii, name in enumerate(grid["param_names"])])
+    param_keys = [str(key) for key in grid["param_keys"]]
+    param_values = grid["param_values"]
+    for name in names:
+        values = param_values[param_index[name]]
+        for jj, key in enumerate(param_keys):
+            if np.isfinite(values[jj]):
+                out[name][key] = values[jj]
+
+    return out, names
+
 def read_files(files):
 
     names = []
@@ -373,67 +583,102 @@ def read_files(files):
 
     return mags, names
 
-def xcorr_mags(mags1,mags2):
-    nmags1 = len(mags1)
-    nmags2 = len(mags2)
+def resample_mags(mags,t,filt="g"):
+    """
+    Each light curve of mags interpolated once onto t, with non-finite
+    points dropped. Returns a zero-padded (nmags, ntimes) array and the
+    number of valid points of each row.
+    """
+    mag = np.zeros((len(mags),len(t)))
+    lengths = np.zeros(len(mags),dtype=int)
+    for ii,name in enumerate(mags.keys()):
+        maginterp = np.interp(t, mags[name]["t"], mags[name][filt])
+        maginterp = maginterp[np.isfinite(maginterp)]
+        lengths[ii] = len(maginterp)
+        mag[ii,:lengths[ii]] = maginterp
+    return mag, lengths
+
+def chisquare_slides(obs,exp,batchsize=32):
+    """
+    For every pair of rows of obs (nobs, n) and exp (nexp, m), m >= n, the
+    minimum over slides kk of |sum((obs - exp[kk:kk+n])**2/exp[kk:kk+n])|.
+    The slides are evaluated together through FFT correlations, in blocks
+    of batchsize rows of obs by batchsize rows of exp.
+    """
+    n, m = obs.shape[1], exp.shape[1]
+    nslides = m - n + 1
+    obssum = np.sum(obs,axis=1)
+
+    # (obs-exp)**2/exp = obs**2/exp - 2*obs + exp
+    if nslides == 1:
+        chi = np.dot(obs**2, 1.0/exp.T) - 2*obssum[:,np.newaxis] + np.sum(exp,axis=1)[np.newaxis,:]
+        return np.abs(chi)
+
+    nfft = 2**int(np.ceil(np.log2(m+n-1)))
+    fobs = np.conj(np.fft.rfft(obs**2, nfft))
+    fexp = np.fft.rfft(1.0/exp, nfft)
+    cumexp = np.hstack((np.zeros((len(exp),1)),np.cumsum(exp,axis=1)))
+    window = cumexp[:,n:] - cumexp[:,:nslides]
+
+    chi = np.zeros((len(obs),len(exp)))
+    for start in range(0,len(obs),batchsize):
+        for start2 in range(0,len(exp),batchsize):
+            rows, cols = slice(start,start+batchsize), slice(start2,start2+batchsize)
+            corr = np.fft.irfft(fobs[rows,np.newaxis,:]*fexp[np.newaxis,cols,:], nfft)[:,:,:nslides]
+            chisquares = corr - 2*obssum[rows,np.newaxis,np.newaxis] + window[np.newaxis,cols,:]
+            chi[rows,cols] = np.min(np.abs(chisquares),axis=2)
+    return chi
+
+def xcorr_mags(mags1,mags2,filt="g",batchsize=32):
+    """
+    Maximum normalized cross-correlation and minimum chi-square over slides
+    of the filt light curves of every pair in mags1 x mags2, on a common
+    grid of -100 to 100 days. Each light curve is resampled once and the
+    cross-correlations are computed by FFT in blocks of batchsize light
+    curves of mags1 by batchsize of mags2, so memory does not grow with the
+    size of either set.
+    """
+    t = np.arange(-100,100,0.1)
+    mag1, lengths1 = resample_mags(mags1,t,filt=filt)
+    mag2, lengths2 = resample_mags(mags2,t,filt=filt)
+    nmags1, nmags2 = len(mag1), len(mag2)
+
     xcorrvals = np.zeros((nmags1,nmags2))
     chisquarevals = np.zeros((nmags1,nmags2))
-    for ii,name1 in enumerate(mags1.iterkeys()):
-        for jj,name2 in enumerate(mags2.iterkeys()):
-
-            t1 = mags1[name1]["t"]
-            t2 = mags2[name2]["t"]
-            t = np.unique(np.append(t1,t2))
-            t = np.arange(-100,100,0.1)      
-
-            mag1 = np.interp(t, t1, mags1[name1]["g"])
-            mag2 = np.interp(t, t2, mags2[name2]["g"])
-
-            indexes1 = np.where(~np.isnan(mag1))[0]
-            indexes2 = np.where(~np.isnan(mag2))[0]
-            indexes = np.intersect1d(indexes1,indexes2)
-            mag1 = mag1[indexes1]
-            mag2 = mag2[indexes2]
-
-            indexes1 = np.where(~np.isinf(mag1))[0]
-            indexes2 = np.where(~np.isinf(mag2))[0]
-            indexes = np.intersect1d(indexes1,indexes2)
-            mag1 = mag1[indexes1]
-            mag2 = mag2[indexes2]
-
-            if len(indexes) == 0:
-                xcorrvals[ii,jj] = 0.0
-                continue           
-
-            if len(mag1) < len(mag2):
-                mag1vals = (mag1 - np.mean(mag1)) / (np.std(mag1) * len(mag1))
-                mag2vals = (mag2 - np.mean(mag2)) / (np.std(mag2))
+
+    # standardized light curves, zero outside the valid points
+    def standardize(mag, lengths):
+        mask = np.arange(mag.shape[1])[np.newaxis,:] < lengths[:,np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.sum(mag,axis=1) / lengths
+            std = np.sqrt(np.sum(mask*(mag-mean[:,np.newaxis])**2,axis=1) / lengths)
+            return np.where(mask, (mag-mean[:,np.newaxis])/std[:,np.newaxis], 0.0)
+    mag1vals = standardize(mag1, lengths1)
+    mag2vals = standardize(mag2, lengths2)
+
+    # the shorter light curve of each pair is also divided by its length
+    nfft = 2**int(np.ceil(np.log2(2*len(t)-1)))
+    fmag1 = np.fft.rfft(mag1vals, nfft)
+    fmag2 = np.conj(np.fft.rfft(mag2vals, nfft))
+    norm = np.minimum.outer(lengths1, lengths2).astype(float)
+    for start in range(0,nmags1,batchsize):
+        for start2 in range(0,nmags2,batchsize):
+            rows, cols = slice(start,start+batchsize), slice(start2,start2+batchsize)
+            xcorr = np.fft.irfft(fmag1[rows,np.newaxis,:]*fmag2[np.newaxis,cols,:], nfft)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                xcorrvals[rows,cols] = np.max(np.abs(xcorr),axis=2) / norm[rows,cols]
+    xcorrvals[norm == 0] = 0.0
+
+    # chi-square of the shorter light curve against each slide of the longer
+    for length1 in np.unique(lengths1[lengths1 > 0]):
+        for length2 in np.unique(lengths2[lengths2 > 0]):
+            idx1 = np.where(lengths1 == length1)[0]
+            idx2 = np.where(lengths2 == length2)[0]
+            if length1 <= length2:
+                chi = chisquare_slides(mag1[idx1,:length1], mag2[idx2,:length2], batchsize=batchsize)
             else:
-                mag1vals = (mag1 - np.mean(mag1)) / (np.std(mag1))
-                mag2vals = (mag2 - np.mean(mag2)) / (np.std(mag2) * len(mag2))
-
-            xcorr = np.correlate(mag1vals, mag2vals, mode='full')
-            xcorr_corr = np.max(np.abs(xcorr))
-
-            #mag1 = mag1 * 100.0 / np.sum(mag1)
-            #mag2 = mag2 * 100.0 / np.sum(mag2)
-
-            nslides = len(mag1) - len(mag1)
-            if nslides == 0:
-                chisquares = scipy.stats.chisquare(mag1, f_exp=mag1)[0]
-            elif nslides > 0:
-                chisquares = []
-                for kk in xrange(np.abs(nslides)):
-                    chisquare = scipy.stats.chisquare(mag1, f_exp=mag2[kk:len(mag1)])[0] 
-                    chisquares.append(chisquare)
-            elif nslides < 0:
-                chisquares = []
-                for kk in xrange(np.abs(nslides)):
-                    chisquare = scipy.stats.chisquare(mag2, f_exp=mag1[kk:len(mag2)])[0] 
-                    chisquares.append(chisquare)
-
-            xcorrvals[ii,jj] = xcorr_corr
-            chisquarevals[ii,jj] = np.min(np.abs(chisquares))
+                chi = chisquare_slides(mag2[idx2,:length2], mag1[idx1,:length1], batchsize=batchsize).T
+            chisquarevals[np.ix_(idx1,idx2)] = chi
 
     return xcorrvals, chisquarevals
 
@@ -693,61 +938,90 @@ def get_legend(model):
 
     return legend_name
 
+# Model bands produced by the KNModels (rows of the (9, ntimes) mag array)
+model_bands = ["u","g","r","i","z","y","J","H","K"]
+
+# Survey band -> {model band: weight}; survey magnitudes are the weighted
+# average of the model bands (or of their fluxes, see get_band_matrix)
+band_weights = {
+    "u": {"u": 1.0},
+    "g": {"g": 1.0},
+    "r": {"r": 1.0},
+    "i": {"i": 1.0},
+    "z": {"z": 1.0},
+    "y": {"y": 1.0},
+    "J": {"J": 1.0},
+    "H": {"H": 1.0},
+    "K": {"K": 1.0},
+    "w": {"g": 1.0/3.0, "r": 1.0/3.0, "i": 1.0/3.0},
+    "U": {"u": 1.0},
+    "UVW2": {"u": 1.0},
+    "UVW1": {"u": 1.0},
+    "UVM2": {"u": 1.0},
+    "B": {"g": 1.0},
+    "c": {"g": 0.5, "r": 0.5},
+    "V": {"g": 0.5, "r": 0.5},
+    "F606W": {"g": 0.5, "r": 0.5},
+    "o": {"r": 0.5, "i": 0.5},
+    "R": {"z": 1.0},
+    "I": {"z": 0.5, "y": 0.5},
+    "F814W": {"z": 0.5, "y": 0.5},
+    "F160W": {"H": 1.0},
+}
+
+_band_matrices = {}
+
+def get_band_matrix(keys):
+    """
+    Return the (len(keys), 9) weight matrix mapping the model bands onto
+    the survey bands in keys. Matrices are cached per set of keys.
+    """
+    keys = tuple(keys)
+    if not keys in _band_matrices:
+        W = np.zeros((len(keys), len(model_bands)))
+        for ii, key in enumerate(keys):
+            if not key in band_weights:
+                raise ValueError("No band mapping for filter %s" % key)
+            for band, weight in band_weights[key].items():
+                W[ii, model_bands.index(band)] = weight
+        _band_matrices[keys] = (W, W != 0)
+    return _band_matrices[keys]
+
+def get_mags(mag, keys, fluxspace=False):
+    """
+    Map model magnitudes onto the survey bands in keys with a single
+    matrix product. mag is (9, ntimes) or (nsamples, 9, ntimes); the
+    output is (len(keys), ntimes) or (nsamples, len(keys), ntimes).
+    With fluxspace=True the band fluxes are averaged instead of the
+    magnitudes. Outputs depending on a non-finite model band are NaN.
+    """
+    W, used = get_band_matrix(keys)
+    mag = np.asarray(mag, dtype=float)
+    bad = ~np.isfinite(mag)
+    vals = np.where(bad, 0.0, mag)
+    if fluxspace:
+        vals = np.where(bad, 0.0, 10**(-0.4*vals))
+    mags = np.matmul(W, vals)
+    if fluxspace:
+        with np.errstate(divide='ignore'):
+            mags = -2.5*np.log10(mags)
+    mags[np.matmul(used, bad)] = np.nan
+    return mags
+
 def get_mag(mag,key):
-    if key == "u":
-        magave = 1.0*mag[0]
-    elif key == "g":
-        magave = 1.0*mag[1]
-    elif key == "r":
-        magave = 1.0*mag[2]
-    elif key == "i":
-        magave = 1.0*mag[3]
-    elif key == "z":
-        magave = 1.0*mag[4]
-    elif key == "y":
-        magave = 1.0*mag[5]
-    elif key == "J":
-        magave = 1.0*mag[6]
-    elif key == "H":
-        magave = 1.0*mag[7]
-    elif key == "K":
-        magave = 1.0*mag[8]
-    elif key == "w": 
-        magave = (mag[1]+mag[2]+mag[3])/3.0
-    elif key in ["U","UVW2","UVW1","UVM2"]:
-        magave = 1.0*mag[0]
-    elif key == "B":
-        magave = 1.0*mag[1]
-    elif key in ["c","V","F606W"]:
-        magave = (mag[1]+mag[2])/2.0
-    elif key == "o":
-        magave = (mag[2]+mag[3])/2.0
-    elif key == "R":
-        magave = 1.0*mag[4]
-    elif key in ["I","F814W"]:
-        magave = (mag[4]+mag[5])/2.0
-    elif key == "F160W":
-        magave = 1.0*mag[7]
-    return magave
+    return get_mags(mag, [key])[0]
 
 def get_med(magtable, errorbudget = 0.0, filts = ["u","g","r","i","z","y","J","H","K"]):
 
-    mag_all = {}
+    mag_all = get_mags(np.array([row["mag"] for row in magtable]), filts)
     med_all = {}
     for ii, filt in enumerate(filts):
         med_all[filt] = {}
-        for jj, row in enumerate(magtable):
-            t, lbol, mag = row["t"], row["lbol"], row["mag"]
-            if (jj==0):
-                mag_all[filt] = np.empty((0,len(t)))
-
-            maginterp = get_mag(mag,filt)
-            mag_all[filt] = np.append(mag_all[filt],[maginterp],axis=0)
-        magmed = np.percentile(mag_all[filt], 50, axis=0)
-        magmax = np.percentile(mag_all[filt], 90, axis=0) + errorbudget
-        magmin = np.percentile(mag_all[filt], 10, axis=0) - errorbudget
-        magmax2 = np.percentile(mag_all[filt], 95, axis=0) + errorbudget
-        magmin2 = np.percentile(mag_all[filt], 5, axis=0) - errorbudget
+        magmed = np.percentile(mag_all[:,ii,:], 50, axis=0)
+        magmax = np.percentile(mag_all[:,ii,:], 90, axis=0) + errorbudget
+        magmin = np.percentile(mag_all[:,ii,:], 10, axis=0) - errorbudget
+        magmax2 = np.percentile(mag_all[:,ii,:], 95, axis=0) + errorbudget
+        magmin2 = np.percentile(mag_all[:,ii,:], 5, axis=0) - errorbudget
 
         med_all[filt]["10"] = magmin
         med_all[filt]["50"] = magmed
@@ -759,20 +1033,14 @@ def get_med(magtable, errorbudget = 0.0, filts = ["u","g","r","i","z","y","J","H
 
 def get_peak(magtable, filts = ["u","g","r","i","z","y","J","H","K"]):
 
+    t = np.array([row["t"] for row in magtable])
+    mag_all = get_mags(np.array([row["mag"] for row in magtable]), filts)
+    rows = np.arange(len(t))
+
     peaks_all = {}
     for ii, filt in enumerate(filts):
-        peaks_all[filt] = {}
-        for jj, row in enumerate(magtable):
-            t, lbol, mag = row["t"], row["lbol"], row["mag"]
-            maginterp = get_mag(mag,filt)
-            if (jj==0):
-                peaks_all[filt] = np.empty((0,2)) 
-
-            idx = np.argmin(maginterp)
-            time_min = t[idx]
-            mag_min = maginterp[idx]
-
-            peaks_all[filt] = np.append(peaks_all[filt],[[time_min,mag_min]],axis=0)
+        idx = np.argmin(mag_all[:,ii,:], axis=1)
+        peaks_all[filt] = np.vstack((t[rows,idx], mag_all[rows,ii,idx])).T
     return peaks_all
 
 def get_envelope(lambdas,spec):
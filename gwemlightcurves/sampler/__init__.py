@@ -23,4 +23,5 @@
 from .model import *
 from .loglike import *
 from .prior import *
+from .speclike import *
 
@@ -1117,6 +1117,10 @@ def calc_prob(tmag, lbol, mag, t0, zp, errorbudget=Global.errorbudget):
         gaussprob = np.nan
         nsamples = 0
 
+        keys = [key for key in Global.data_out if key in Global.filters and key in lightcurve_utils.band_weights]
+        if len(keys) > 0:
+            mags = lightcurve_utils.get_mags(mag, keys, fluxspace=Global.doFluxBands)
+
         for key in Global.data_out:
             samples = Global.data_out[key]
             t = samples[:,0]
@@ -1128,35 +1132,18 @@ def calc_prob(tmag, lbol, mag, t0, zp, errorbudget=Global.errorbudget):
             y = y[idx]
             sigma_y = sigma_y[idx]
             if len(idx) == 0: continue
-            if not key in Global.filters: continue
-
-            keyslist = ["u","g","r","i","z","y","J","H","K"]
+            if not key in keys: continue
 
-            if key in keyslist:
-                idx = keyslist.index(key)
-                ii = np.where(np.isfinite(mag[idx]))[0]
-                if len(ii) == 0:
-                    maginterp = np.nan*np.ones(t.shape)
-                else:
-                    if Global.doWaveformExtrapolate:
-                        f = interp.interp1d(tmag[ii], mag[idx][ii], fill_value='extrapolate')
-                    else:
-                        f = interp.interp1d(tmag[ii], mag[idx][ii], fill_value=np.nan, bounds_error = False)
-                    maginterp = f(t)
-            elif key in ["w","c","o","V","B","R","I","F606W","F160W","F814W","U","UVW2","UVW1","UVM2"]:
-                magave = lightcurve_utils.get_mag(mag,key)
-
-                ii = np.where(np.isfinite(magave))[0]
-                if len(ii) == 0:
-                    maginterp = np.nan*np.ones(t.shape)
-                else:
-                    if Global.doWaveformExtrapolate:                    
-                        f = interp.interp1d(tmag[ii], magave[ii], fill_value='extrapolate')
-                    else:
-                        f = interp.interp1d(tmag[ii], magave[ii], fill_value=np.nan, bounds_error = False)
-                    maginterp = f(t)
+            magave = mags[keys.index(key)]
+            ii = np.where(np.isfinite(magave))[0]
+            if len(ii) == 0:
+                maginterp = np.nan*np.ones(t.shape)
             else:
-                continue
+                if Global.doWaveformExtrapolate:
+                    f = interp.interp1d(tmag[ii], magave[ii], fill_value='extrapolate')
+                else:
+                    f = interp.interp1d(tmag[ii], magave[ii], fill_value=np.nan, bounds_error = False)
+                maginterp = f(t)
 
             maginterp = maginterp + zp
             sigma = np.sqrt(errorbudget**2 + sigma_y**2)
@@ -1237,3 +1224,12 @@ def addconst(array):
 
     return array_copy
 
+
+def loglike_batch(loglike, cube):
+    """
+    Evaluate a myloglike_* function on an (N, ndim) batch of physical
+    parameters (e.g. the output of prior_batch).
+    """
+    cube = np.array(cube, dtype=float, ndmin=2)
+    ndim = cube.shape[1]
+    return np.array([loglike(row, ndim, ndim) for row in cube])
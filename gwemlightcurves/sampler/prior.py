@@ -649,3 +649,14 @@ def myprior_Ka2017_TrPi2018_A(cube, ndim, nparams):
         cube[11] = cube[11]*4.0 - 4.0
         cube[12] = cube[12]*10.0 - 0.0
         cube[13] = cube[13]*2*Global.ZPRange - Global.ZPRange
+
+def prior_batch(prior, cube):
+        """
+        Apply a myprior_* transform to an (N, ndim) batch of unit cube points.
+        The transforms only index the cube by parameter, so they are run on
+        the transposed view and each cube[i] is a length N array.
+        """
+        cube = np.array(cube, dtype=float, ndmin=2)
+        ndim = cube.shape[1]
+        prior(cube.T, ndim, ndim)
+        return cube
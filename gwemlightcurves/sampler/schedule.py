@@ -0,0 +1,269 @@
+
+import os, pickle
+import optparse
+import multiprocessing
+import numpy as np
+from gwemlightcurves import lightcurve_utils, Global
+from gwemlightcurves.sampler import run
+
+# Options understood by run_job, with the defaults of run_lightcurves_models.py
+defaults = {
+    "outputDir": "../output",
+    "plotDir": "../plots",
+    "lightcurvesDir": "../lightcurves",
+    "name": "GW170817",
+    "distance": 40.0,
+    "distance_uncertainty": -1.0,
+    "T0": 57982.5285236896,
+    "doFixZPT0": False,
+    "doFitSigma": False,
+    "doWaveformExtrapolate": False,
+    "doFluxBands": False,
+    "doEOSFit": False,
+    "doBNSFit": False,
+    "model": "Ka2017",
+    "doMasses": False,
+    "doEjecta": False,
+    "errorbudget": 1.0,
+    "filters": "g,r,i,z",
+    "tmin": 0.05,
+    "tmax": 7.0,
+    "n_live_points": 100,
+    "sampler": "multinest",
+    "batch_size": 0,
+    "evidence_tolerance": 0.5,
+    "max_iter": 0,
+    "doFixXlan": False,
+    "Xlan": 1e-9,
+    "doFixT": False,
+    "T": 1e4,
+    "doFixPhi": False,
+    "phi": 0.0,
+    "colormodel": "a2.0",
+}
+
+svd_models = ["Ka2017", "Ka2017inc", "Ka2017_A", "Ka2017x2", "Ka2017x2inc", "Ka2017x3", "Ka2017x3inc", "Ka2017_TrPi2018", "Ka2017_TrPi2018_A", "Bu2019", "Bu2019inc", "Bu2019inc_TrPi2018", "Bu2019lf", "Bu2019lr","Bu2019rp","Bu2019rps"]
+
+def get_options(job):
+    """
+    Build an options object for a job (dict of option name -> value).
+    """
+    vals = dict(defaults)
+    vals.update(job)
+    return optparse.Values(vals)
+
+def read_manifest(filename):
+    """
+    Read a manifest of fitting jobs, one job per line as key=value pairs,
+    e.g. name=GRB150101B model=Ka2017 filters=r,i errorbudget=0.25 doEjecta=1
+    """
+    jobs = []
+    lines = [line.rstrip('\n') for line in open(filename)]
+    for line in lines:
+        line = line.split("#")[0].strip()
+        if not line: continue
+        job = {}
+        for item in line.split():
+            key, val = item.split("=")
+            default = defaults.get(key, "")
+            if isinstance(default, bool):
+                job[key] = val.lower() in ["1","true","yes"]
+            elif isinstance(default, float):
+                job[key] = float(val)
+            elif isinstance(default, int):
+                job[key] = int(val)
+            else:
+                job[key] = val
+        jobs.append(job)
+    return jobs
+
+def get_colormodel(opts):
+    colormodel = opts.colormodel.split(",")
+    if len(colormodel) == 1:
+        colormodel = colormodel[0]
+    return colormodel
+
+def get_plotdir(opts):
+    """
+    Output directory of a job, laid out as in run_lightcurves_models.py --doEvent
+    """
+    filters = opts.filters.split(",")
+    plotDir = os.path.join(opts.plotDir,'gws')
+    if opts.doEOSFit:
+        name = '%s_EOSFit' % opts.model
+    elif opts.doBNSFit:
+        name = '%s_BNSFit' % opts.model
+    else:
+        name = '%s' % opts.model
+    if opts.doFixZPT0:
+        name = '%s_FixZPT0' % name
+    plotDir = os.path.join(plotDir,name)
+    if opts.model in ["Ka2017inc","Ka2017x2inc","Ka2017x3inc"]:
+        plotDir = os.path.join(plotDir,'%s'%("_".join(get_colormodel(opts))))
+    plotDir = os.path.join(plotDir,"_".join(filters))
+    plotDir = os.path.join(plotDir,"%.0f_%.0f"%(opts.tmin,opts.tmax))
+    if opts.model in ["DiUj2017","KaKy2016","Me2017","Me2017_A","Me2017x2","SmCh2017","WoKo2017","BaKa2016","Ka2017","Ka2017inc","Ka2017_A","Ka2017x2","Ka2017x2inc","Ka2017x3","Ka2017x3inc", "RoFe2017","Bu2019","Bu2019inc","Bu2019rp","Bu2019rps"]:
+        if opts.doMasses:
+            plotDir = os.path.join(plotDir,'masses')
+        elif opts.doEjecta:
+            plotDir = os.path.join(plotDir,'ejecta')
+    plotDir = os.path.join(plotDir,opts.name)
+    if opts.doFixXlan:
+        plotDir = os.path.join(plotDir,"%.2f"% (np.log10(opts.Xlan)))
+    if opts.doFixT:
+        plotDir = os.path.join(plotDir,"%.2f"% (np.log10(opts.T)))
+    if opts.doFixPhi:
+        plotDir = os.path.join(plotDir,"%.2f"% (opts.phi))
+    if opts.doFitSigma:
+        plotDir = os.path.join(plotDir,"fit")
+    else:
+        plotDir = os.path.join(plotDir,"%.2f"%opts.errorbudget)
+    return plotDir
+
+def load_event(opts):
+    """
+    Load an event light curve and shift it to absolute magnitudes relative to T0
+    """
+    filters = opts.filters.split(",")
+    filename = "%s/%s.dat"%(opts.lightcurvesDir,opts.name)
+    data_out = lightcurve_utils.loadEvent(filename)
+
+    for key in list(data_out.keys()):
+        if not key in filters:
+            del data_out[key]
+            continue
+        data_out[key][:,0] = data_out[key][:,0] - opts.T0
+        data_out[key][:,1] = data_out[key][:,1] - 5*(np.log10(opts.distance*1e6) - 1)
+        idxs = np.where((data_out[key][:,0]>=opts.tmin) & (data_out[key][:,0]<=opts.tmax) & ~np.isnan(data_out[key][:,2]))[0]
+        data_out[key] = data_out[key][idxs,:]
+
+    return data_out
+
+def load_svd_model(model, ModelPath, phi=0.0, colormodel="a2.0"):
+    """
+    Load the SVD surrogate(s) used by model into Global
+    """
+    if not model in svd_models:
+        return
+
+    if model == "Bu2019":
+        name = 'Bu2019_phi%d' % phi
+    elif model in ["Bu2019inc","Bu2019inc_TrPi2018"]:
+        name = 'Bu2019inc'
+    elif model in ["Bu2019lf","Bu2019lr","Bu2019rp","Bu2019rps"]:
+        name = model
+    else:
+        name = 'Ka2017'
+
+    modelfile = os.path.join(ModelPath,'%s_mag.pkl' % name)
+    with open(modelfile, 'rb') as handle:
+        svd_mag_model = pickle.load(handle)
+    Global.svd_mag_model = svd_mag_model
+
+    modelfile = os.path.join(ModelPath,'%s_lbol.pkl' % name)
+    with open(modelfile, 'rb') as handle:
+        svd_lbol_model = pickle.load(handle)
+    Global.svd_lbol_model = svd_lbol_model
+
+    if model in ["Ka2017inc"]:
+        modelfile = os.path.join(ModelPath,'%s.pkl' % colormodel)
+        with open(modelfile, 'rb') as handle:
+            svd_mag_color_model = pickle.load(handle)
+        Global.svd_mag_color_model = svd_mag_color_model
+    elif model in ["Ka2017x2inc","Ka2017x3inc"]:
+        Global.svd_mag_color_models = []
+        for colorm in colormodel:
+            if colorm == "a1.0":
+                Global.svd_mag_color_models.append("a1.0")
+            else:
+                modelfile = os.path.join(ModelPath,'%s.pkl' % colorm)
+                with open(modelfile, 'rb') as handle:
+                    svd_mag_color_model = pickle.load(handle)
+                Global.svd_mag_color_models.append(svd_mag_color_model)
+
+def job_done(job):
+    opts = get_options(job)
+    return os.path.isfile(os.path.join(get_plotdir(opts),"data.pkl"))
+
+def run_job(job):
+    """
+    Fit a single job. Assumes the surrogate for its model is already in Global.
+    Writes data.pkl (and the sampler output) into the job's plot directory.
+    """
+    opts = get_options(job)
+    plotDir = get_plotdir(opts)
+    if not os.path.isdir(plotDir):
+        os.makedirs(plotDir)
+
+    if opts.doFixZPT0:
+        ZPRange = 0.1
+    else:
+        ZPRange = 5.0
+    T0Range = 0.1
+    if opts.distance_uncertainty > 0:
+        ZPRange = np.abs(5*(opts.distance_uncertainty/opts.distance)/np.log(10))
+
+    data_out = load_event(opts)
+
+    Global.data_out = data_out
+    Global.errorbudget = opts.errorbudget
+    Global.ZPRange = ZPRange
+    Global.T0Range = T0Range
+    Global.doLightcurves = 1
+    Global.filters = opts.filters.split(",")
+    Global.doWaveformExtrapolate = opts.doWaveformExtrapolate
+    Global.doFluxBands = opts.doFluxBands
+    # reset fixed parameters so they do not carry over from earlier jobs
+    Global.Xlan = 0
+    Global.T = 0
+    Global.phi = -1
+    if opts.doFixXlan:
+        Global.Xlan = np.log10(opts.Xlan)
+    if opts.doFixT:
+        Global.T = np.log10(opts.T)
+    if opts.doFixPhi:
+        Global.phi = opts.phi
+
+    data, tmag, lbol, mag, t0_best, zp_best, n_params, labels, best = run.multinest(opts,plotDir)
+    truths = lightcurve_utils.get_truths(opts.name,opts.model,n_params,opts.doEjecta)
+
+    # write then rename, so an interrupted job is never marked as done
+    pcklFile = os.path.join(plotDir,"data.pkl")
+    f = open(pcklFile + ".tmp", 'wb')
+    pickle.dump((data_out, data, tmag, lbol, mag, t0_best, zp_best, n_params, labels, best,truths), f)
+    f.close()
+    os.rename(pcklFile + ".tmp", pcklFile)
+
+    return plotDir
+
+def run_jobs(jobs, nprocs=1):
+    """
+    Run a list of jobs. Jobs are grouped by surrogate so each is loaded once
+    and shared with a pool of nprocs forked workers. Jobs whose data.pkl
+    already exists are skipped, so an interrupted run can simply be restarted.
+    """
+    groups = {}
+    for job in jobs:
+        if job_done(job):
+            print("Skipping completed job %s %s" % (job.get("name"), job.get("model")))
+            continue
+        opts = get_options(job)
+        key = (opts.model, opts.outputDir, opts.phi, opts.colormodel)
+        groups.setdefault(key, []).append(job)
+
+    plotDirs = []
+    for key in groups:
+        model, outputDir, phi, colormodel = key
+        opts = get_options(groups[key][0])
+        load_svd_model(model, '%s/svdmodels'%(outputDir), phi=phi, colormodel=get_colormodel(opts))
+
+        if nprocs > 1:
+            pool = multiprocessing.get_context("fork").Pool(nprocs)
+            plotDirs = plotDirs + pool.map(run_job, groups[key], chunksize=1)
+            pool.close()
+            pool.join()
+        else:
+            for job in groups[key]:
+                plotDirs.append(run_job(job))
+
+    return plotDirs
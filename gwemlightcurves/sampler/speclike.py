@@ -0,0 +1,118 @@
+
+import numpy as np
+import scipy.sparse
+import scipy.stats
+
+# Telluric regions (Angstroms) excluded from spectral fits, as in get_envelope
+telluric_masks = [[10100,10200],[13000,15000],[17900,19700]]
+
+def get_resample_operator(lambdas, wav):
+    """
+    Sparse (len(wav) x len(lambdas)) matrix of linear interpolation weights
+    from the model wavelength grid lambdas onto the observed wavelengths wav
+    (which must lie within the grid)
+    """
+    jj = np.clip(np.searchsorted(lambdas, wav) - 1, 0, len(lambdas)-2)
+    w = (wav-lambdas[jj])/(lambdas[jj+1]-lambdas[jj])
+    rows = np.hstack((np.arange(len(wav)),np.arange(len(wav))))
+    cols = np.hstack((jj,jj+1))
+    vals = np.hstack((1-w,w))
+    return scipy.sparse.csr_matrix((vals,(rows,cols)),shape=(len(wav),len(lambdas)))
+
+class SpecLikelihood(object):
+    """
+    Spectral likelihood for a set of observed epochs (data_out as loaded by
+    lightcurve_utils.loadEventSpec, keyed by epoch time) against model spectra
+    on a fixed (lambdas, t) grid, as in calc_prob_spec of run_spec_models_SVD.
+
+    The resampling of the model wavelength grid onto every epoch, with zero
+    fluxes, telluric masks and points outside the model grid removed, is
+    precomputed as one block sparse operator. Evaluating a batch of model
+    spectra is then a linear interpolation in time (which depends on t0)
+    followed by a single sparse matrix product.
+    """
+
+    def __init__(self, data_out, t, lambdas, errorbudget=1.0, masks=telluric_masks, doAbsorption=False):
+
+        self.t = np.asarray(t, dtype=float)
+        self.lambdas = np.asarray(lambdas, dtype=float)
+        self.errorbudget = errorbudget
+        self.doAbsorption = doAbsorption
+
+        self.epochs = []
+        operators, flux, sigma, counts = [], [], [], []
+        for key in data_out:
+            wav2, flux2, error = data_out[key]["lambda"], data_out[key]["data"], data_out[key]["error"]
+            keep = np.not_equal(flux2,0) & (wav2 >= self.lambdas[0]) & (wav2 <= self.lambdas[-1])
+            for mask in masks:
+                keep = keep & ~((wav2 >= mask[0]) & (wav2 <= mask[1]))
+            ii = np.where(keep)[0]
+            if len(ii) < 2: continue
+            wav2, flux2, error = wav2[ii], flux2[ii], error[ii]
+
+            if doAbsorption:
+                sigma.append(errorbudget*np.ones(flux2.shape))
+                flux.append(flux2)
+            else:
+                sigma_y = np.abs(error/(flux2*np.log(10)))
+                sigma.append(np.sqrt((np.log10(1+errorbudget))**2 + sigma_y**2))
+                flux.append(np.log10(np.abs(flux2)))
+
+            self.epochs.append(float(key))
+            operators.append(get_resample_operator(self.lambdas, wav2))
+            counts.append(len(ii))
+
+        self.epochs = np.array(self.epochs)
+        self.flux = np.hstack(flux)
+        self.sigma = np.hstack(sigma)
+        self.counts = np.array(counts)
+        self.starts = np.hstack((0,np.cumsum(self.counts)[:-1]))
+        # (nobs x nepochs*nlambda), acting on the model spectra at each epoch
+        self.operator = scipy.sparse.block_diag(operators, format='csr')
+
+    def resample(self, spec, t0):
+        """
+        log10 model flux at the observed (epoch, wavelength) points, shape
+        (nobs, nsamples), for spec of shape (nsamples, nlambda, ntimes)
+        """
+        nsamples = spec.shape[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logspec = np.log10(spec)
+
+        tt = self.epochs[np.newaxis,:] - np.atleast_1d(t0)[:,np.newaxis]
+        jj = np.clip(np.searchsorted(self.t, tt) - 1, 0, len(self.t)-2)
+        w = (tt-self.t[jj])/(self.t[jj+1]-self.t[jj])
+        idx = np.arange(nsamples)[:,np.newaxis]
+        logspec_epochs = logspec[idx,:,jj]*(1-w)[:,:,np.newaxis] + logspec[idx,:,jj+1]*w[:,:,np.newaxis]
+
+        return self.operator.dot(logspec_epochs.reshape((nsamples,-1)).T)
+
+    def __call__(self, spec, t0, zp):
+        """
+        Log likelihood of model spectra spec, of shape (nlambda, ntimes) or
+        (nsamples, nlambda, ntimes), for time offsets t0 and zero points zp
+        """
+        spec = np.asarray(spec)
+        single = spec.ndim == 2
+        spec = spec.reshape((-1,)+spec.shape[-2:])
+        nsamples = spec.shape[0]
+        t0 = np.broadcast_to(t0, (nsamples,))
+        zp = np.broadcast_to(zp, (nsamples,))
+
+        flux1 = self.resample(spec, t0) - zp[np.newaxis,:]/2.5
+        if self.doAbsorption:
+            flux1 = 10**flux1
+            for start, count in zip(self.starts, self.counts):
+                flux1[start:start+count] = flux1[start:start+count]/np.nanmax(flux1[start:start+count],axis=0)
+
+        chisquarevals = ((flux1-self.flux[:,np.newaxis])/self.sigma[:,np.newaxis])**2
+        chisquare = np.add.reduceat(chisquarevals, self.starts, axis=0)
+        chisquare = np.sum(chisquare/(self.counts[:,np.newaxis]-1.0), axis=0)
+
+        with np.errstate(invalid='ignore'):
+            prob = scipy.stats.chi2.logpdf(chisquare, 1, loc=0, scale=1)
+        prob[np.isnan(prob) | (prob == 0.0)] = -np.inf
+
+        if single:
+            return prob[0]
+        return prob
@@ -0,0 +1,101 @@
+
+import numpy as np
+
+try:
+    import healpy as hp
+except:
+    print('Please install healpy')
+    pass
+
+try:
+    from ligo.skymap.io import fits
+    from ligo.skymap.distance import parameters_to_marginal_moments
+except:
+    print('Please install ligo.skymap')
+    pass
+
+def read_skymap(filename):
+    """
+    Read a 3D (distance) sky map into a map_struct with prob, distmu,
+    distsigma and nside
+    """
+    skymap, metadata = fits.read_sky_map(filename, nest=False, distances=True)
+
+    map_struct = {}
+    map_struct["prob"] = skymap[0]
+    map_struct["distmu"] = skymap[1]
+    map_struct["distsigma"] = skymap[2]
+    map_struct["nside"] = hp.npix2nside(len(skymap[0]))
+
+    return map_struct
+
+def get_best_radec(map_struct):
+    """
+    RA and Dec (degrees) of the most probable pixel
+    """
+    ipix_best = np.argmax(map_struct["prob"])
+    theta_best, phi_best = hp.pix2ang(map_struct["nside"], ipix_best)
+    ra_best = np.rad2deg(phi_best)
+    dec_best = np.rad2deg(0.5 * np.pi - theta_best)
+    return ra_best, dec_best
+
+def get_box_pixels(nside, ra, dec, sigma_ra, sigma_dec, method="grid", ngrid=400):
+    """
+    Pixels within ra +- sigma_ra, dec +- sigma_dec (degrees).
+    method "grid" takes the pixels hit by an ngrid x ngrid grid over the box,
+    in one ang2pix call; "polygon" uses query_polygon on the box corners
+    (the RA/Dec box edges approximated by great circles).
+    """
+    if method == "grid":
+        ra_vector = np.linspace(ra - sigma_ra, ra + sigma_ra, ngrid)
+        dec_vector = np.linspace(dec - sigma_dec, dec + sigma_dec, ngrid)
+        theta, phi = np.meshgrid(0.5 * np.pi - np.deg2rad(dec_vector), np.deg2rad(ra_vector), indexing='ij')
+        ipix = np.unique(hp.ang2pix(nside, theta.ravel(), phi.ravel()))
+    elif method == "polygon":
+        ras = np.array([ra - sigma_ra, ra + sigma_ra, ra + sigma_ra, ra - sigma_ra])
+        decs = np.array([dec - sigma_dec, dec - sigma_dec, dec + sigma_dec, dec + sigma_dec])
+        vertices = hp.ang2vec(0.5 * np.pi - np.deg2rad(decs), np.deg2rad(ras))
+        ipix = hp.query_polygon(nside, vertices)
+    else:
+        raise ValueError("method %s not known" % method)
+
+    return ipix
+
+def get_credible_pixels(prob, level=0.9):
+    """
+    Pixels of the smallest region containing a fraction level of prob
+    """
+    idx = np.argsort(prob)[::-1]
+    cumprob = np.cumsum(prob[idx])
+    nkeep = np.searchsorted(cumprob, level*cumprob[-1]) + 1
+    return np.sort(idx[:nkeep])
+
+def mask_skymap(map_struct, ipix):
+    """
+    Copy of map_struct with the probability outside ipix set to zero and
+    renormalized, plus the marginal distance mean and standard deviation
+    """
+    mask = np.zeros(len(map_struct["prob"]), dtype=bool)
+    mask[ipix] = True
+
+    map_struct_masked = dict(map_struct)
+    prob = np.where(mask, map_struct["prob"], 0.0)
+    map_struct_masked["prob"] = prob / np.sum(prob)
+
+    distmean, diststd = parameters_to_marginal_moments(map_struct_masked["prob"], map_struct["distmu"], map_struct["distsigma"])
+
+    return map_struct_masked, distmean, diststd
+
+def select_skymap(map_struct, sigma_ra=None, sigma_dec=None, level=None, method="grid"):
+    """
+    Restrict a sky map either to a box of half-widths sigma_ra, sigma_dec
+    (degrees) around its most probable pixel, or to its level credible
+    region. Returns the masked map and the marginal distance moments.
+    """
+    if level is not None:
+        ipix = get_credible_pixels(map_struct["prob"], level=level)
+    else:
+        ra_best, dec_best = get_best_radec(map_struct)
+        ipix = get_box_pixels(map_struct["nside"], ra_best, dec_best, sigma_ra, sigma_dec, method=method)
+
+    return mask_skymap(map_struct, ipix)
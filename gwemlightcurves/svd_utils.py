@@ -1,24 +1,136 @@
 # https://arxiv.org/abs/1705.07084
 
 import os, sys, glob
+import multiprocessing
 import numpy as np
 import scipy.interpolate
 from scipy.interpolate import interpolate as interp
 from scipy.interpolate import griddata
 import scipy.signal
+import scipy.sparse.linalg
 
 from gwemlightcurves import lightcurve_utils, Global
 
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import RBF, Matern, DotProduct, ConstantKernel, RationalQuadratic
+from sklearn.utils.extmath import randomized_svd
 
 #import george
 #from george import kernels
 
-def calc_svd_lbol(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
+def interp_extrapolate(x, y, xnew):
+    """
+    Linear interpolation of y(x) onto xnew, extrapolating linearly beyond
+    the end points (as interp1d with fill_value='extrapolate')
+    """
+    idx = np.argsort(x)
+    x, y = x[idx], y[idx]
+    jj = np.clip(np.searchsorted(x, xnew) - 1, 0, len(x)-2)
+    slope = (y[jj+1]-y[jj])/(x[jj+1]-x[jj])
+    return y[jj] + slope*(xnew-x[jj])
+
+def interp_weights(x, xnew):
+    """
+    Indices and weights of linear interpolation from a sorted grid x onto
+    xnew (extrapolating beyond the ends), so that
+    y(xnew) = y[...,jj]*(1-w) + y[...,jj+1]*w for any number of leading axes
+    """
+    jj = np.clip(np.searchsorted(x, xnew) - 1, 0, len(x)-2)
+    w = (xnew-x[jj])/(x[jj+1]-x[jj])
+    return jj, w
+
+def resample_lbol(args):
+    """
+    log10 Lbol of one grid file on the common time grid
+    """
+    t, Lbol, tt = args
+    ii = np.where(np.isfinite(Lbol))[0]
+    lbolinterp = 10**interp_extrapolate(t[ii], np.log10(Lbol[ii]), tt)
+    return np.log10(lbolinterp)
+
+def resample_mag(args):
+    """
+    (ntimes, nfilters) magnitudes of one grid file on the common time grid;
+    filters with fewer than two finite points are set to zero
+    """
+    t, mags, tt = args
+    data = np.zeros((len(tt),len(mags)))
+    for jj, mag in enumerate(mags):
+        ii = np.where(np.isfinite(mag))[0]
+        if len(ii) > 1:
+            data[:,jj] = interp_extrapolate(t[ii], mag[ii], tt)
+    return data
+
+def resample_spec(args):
+    """
+    log10 spectra of one grid file on the common (time, wavelength) grid,
+    from a cubic spline
+    """
+    t, lambdas_d, spec, tt, lambdas = args
+    data = spec.copy()
+    data[data==0.0] = 1e-20
+    f = scipy.interpolate.RectBivariateSpline(t, lambdas_d, np.log10(data), kx=3, ky=3, s=0)
+    return f(tt,lambdas)
+
+def map_pool(func, args, nprocs=1):
+    """
+    map func over args, using a pool of nprocs processes if nprocs > 1
+    """
+    if nprocs > 1:
+        pool = multiprocessing.Pool(nprocs)
+        results = pool.map(func, args, chunksize=max(1, len(args)//(4*nprocs)))
+        pool.close()
+        pool.join()
+        return results
+    else:
+        return [func(arg) for arg in args]
+
+def calc_svd_basis(array, n_coeff, svd_method=None):
+    """
+    Leading n_coeff right singular vectors of a (nmodels x ntimes) training
+    array, as an (ntimes x n_coeff) matrix, and the cumulative fraction of
+    the variance they explain. svd_method is one of
+    full: complete SVD (the original behaviour)
+    truncated: only the leading n_coeff components (ARPACK)
+    randomized: randomized range finder (Halko et al. 2011)
+    Defaults to Global.svd_method.
+    """
+    if svd_method is None:
+        svd_method = Global.svd_method
+    if not svd_method in ["full", "truncated", "randomized"]:
+        raise ValueError("svd_method %s not known" % svd_method)
+    nmodels, ntimes = array.shape
+    k = min(n_coeff, nmodels, ntimes)
+
+    if svd_method == "full" or k == min(nmodels, ntimes):
+        UA, sA, VA = np.linalg.svd(array, full_matrices=False)
+    elif svd_method == "truncated":
+        UA, sA, VA = scipy.sparse.linalg.svds(array, k=k)
+        idx = np.argsort(sA)[::-1]
+        sA, VA = sA[idx], VA[idx,:]
+    elif svd_method == "randomized":
+        UA, sA, VA = randomized_svd(array, n_components=k, n_iter=4, random_state=0)
+    VA = VA.T[:,:n_coeff]
+    if VA.shape[1] < n_coeff:
+        # fewer models than coefficients: the remaining directions carry no signal
+        VA = np.hstack((VA, np.zeros((ntimes, n_coeff-VA.shape[1]))))
+
+    total = np.sum(array**2)
+    if total > 0:
+        explained_variance = np.cumsum(sA[:n_coeff]**2)/total
+    else:
+        explained_variance = np.ones(len(sA[:n_coeff]))
+    print('SVD (%s): %d coefficients explain %.6f of the variance' % (svd_method, n_coeff, explained_variance[-1]))
+
+    return VA, explained_variance
+
+def calc_svd_lbol(tini,tmax,dt, n_coeff = 100, model = "BaKa2016", nprocs = None, svd_method = None):
 
     print("Calculating SVD model of bolometric luminosity...")
 
+    if nprocs is None:
+        nprocs = Global.nprocs
+
     if model == "BaKa2016":    
         fileDir = "../output/barnes_kilonova_spectra"
     elif model == "Ka2017":
@@ -52,126 +164,15 @@ def calc_svd_lbol(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
     elif model == "Bu2019rps":
         fileDir = "../output/bulla_reprocess_slim"
 
-    filenames = glob.glob('%s/*_Lbol.dat'%fileDir)
-
-    lbols, names = lightcurve_utils.read_files_lbol(filenames)
+    lbols, names = lightcurve_utils.load_grid(fileDir, "lbol")
     lbolkeys = lbols.keys()
 
     tt = np.arange(tini,tmax+dt,dt)
 
-    for key in lbolkeys:
-        keySplit = key.split("_")
-        if keySplit[0] == "rpft":
-            mej0 = float("0." + keySplit[1].replace("m",""))
-            vej0 = float("0." + keySplit[2].replace("v",""))
-            lbols[key]["mej"] = mej0
-            lbols[key]["vej"] = vej0
-        elif keySplit[0] == "knova":
-            mej0 = float(keySplit[3].replace("m",""))
-            vej0 = float(keySplit[4].replace("vk",""))
-            if len(keySplit) == 6:
-                Xlan0 = 10**float(keySplit[5].replace("Xlan1e",""))
-            elif len(keySplit) == 7:
-                if "Xlan1e" in keySplit[6]:
-                    Xlan0 = 10**float(keySplit[6].replace("Xlan1e",""))
-                elif "Xlan1e" in keySplit[5]:
-                    Xlan0 = 10**float(keySplit[5].replace("Xlan1e",""))
-
-            #if (mej0 == 0.05) and (vej0 == 0.2) and (Xlan0 == 1e-3):
-          #    del lbols[key]
-            #    continue
-
-            lbols[key]["mej"] = mej0
-            lbols[key]["vej"] = vej0
-            lbols[key]["Xlan"] = Xlan0
-        elif keySplit[0] == "SED":
-            lbols[key]["mej"], lbols[key]["vej"], lbols[key]["Ye"] = lightcurve_utils.get_macronovae_rosswog(key)
-        elif "gamma" in key:
-            kappaLF = float(keySplit[2].replace("kappaLF",""))
-            gammaLF = float(keySplit[3].replace("gammaLF",""))
-            kappaLR = float(keySplit[4].replace("kappaLR",""))
-            gammaLR = float(keySplit[5].replace("gammaLR",""))
-            theta = float(keySplit[6])
-
-            lbols[key]["kappaLF"] = kappaLF
-            lbols[key]["gammaLF"] = gammaLF
-            lbols[key]["kappaLR"] = kappaLR
-            lbols[key]["gammaLR"] = gammaLR
-            lbols[key]["theta"] = theta
-
-        elif "nsns" in key:
-
-            mejdyn = float(keySplit[2].replace("mejdyn",""))
-            mejwind = float(keySplit[3].replace("mejwind",""))
-            phi0 = float(keySplit[4].replace("phi",""))
-            theta = float(keySplit[5])
-
-            lbols[key]["mej_dyn"] = mejdyn
-            lbols[key]["mej_wind"] = mejwind
-            lbols[key]["phi"] = phi0
-            lbols[key]["theta"] = theta
-
-        elif "mejdyn" in key:
-
-            mejdyn = float(keySplit[1].replace("mejdyn",""))
-            mejwind = float(keySplit[2].replace("mejwind",""))
-            phi0 = float(keySplit[4].replace("phi",""))
-            theta = float(keySplit[5])
-
-            lbols[key]["mej_dyn"] = mejdyn
-            lbols[key]["mej_wind"] = mejwind
-            lbols[key]["phi"] = phi0
-            lbols[key]["theta"] = theta
-
-        elif "bluecone" in key:
-
-            mej = float(keySplit[2].replace("mej",""))
-            phi0 = float(keySplit[3].replace("th",""))
-            theta = float(keySplit[4])
-
-            lbols[key]["mej"] = mej
-            lbols[key]["phi"] = 90-phi0
-            lbols[key]["theta"] = theta
-
-        elif "redellips" in key:
-
-            mej = float(keySplit[2].replace("mej",""))
-            a0 = float(keySplit[3].replace("a",""))
-            theta = float(keySplit[4])
-
-            lbols[key]["mej"] = mej
-            lbols[key]["a"] = a0
-            lbols[key]["theta"] = theta
-
-        elif keySplit[0] == "nph1.0e+06":
- 
-            mej0 = float(keySplit[1].replace("mej",""))
-            phi0 = float(keySplit[2].replace("phi",""))
-            theta = float(keySplit[3])
-
-            lbols[key]["mej"] = mej0
-            lbols[key]["phi"] = phi0
-            #lbols[key]["T"] = T0
-            lbols[key]["theta"] = theta
-
-        elif keySplit[0] == "kasenReprocess":
-
-            mej1 = float(keySplit[2].replace("mejcone",""))
-            mej2 = float(keySplit[3].replace("mejell",""))
-            phi = float(keySplit[4].replace("th",""))
-            a = float(keySplit[5].replace("a",""))
-            theta = float(keySplit[6])
-
-            lbols[key]["mej_1"] = mej1
-            lbols[key]["mej_2"] = mej2
-            lbols[key]["phi"] = phi
-            lbols[key]["a"] = a
-            lbols[key]["theta"] = theta
-
-        ii = np.where(np.isfinite(lbols[key]["Lbol"]))[0]
-        f = interp.interp1d(lbols[key]["tt"][ii], np.log10(lbols[key]["Lbol"][ii]), fill_value='extrapolate')
-        lbolinterp = 10**f(tt)
-        lbols[key]["Lbol"]= np.log10(lbolinterp)
+    lbolkeys = list(lbolkeys)
+    results = map_pool(resample_lbol, [(lbols[key]["tt"], lbols[key]["Lbol"], tt) for key in lbolkeys], nprocs=nprocs)
+    for key, lbolinterp in zip(lbolkeys, results):
+        lbols[key]["Lbol"]= lbolinterp
 
     lbolkeys = lbols.keys()
 
@@ -217,11 +218,9 @@ def calc_svd_lbol(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
         lbol_array_postprocess[:,i] = (lbol_array_postprocess[:,i]-mins[i])/(maxs[i]-mins[i])    
     lbol_array_postprocess[np.isnan(lbol_array_postprocess)]=0.0
 
-    UA, sA, VA = np.linalg.svd(lbol_array_postprocess, full_matrices=True)
-    VA = VA.T
+    VA, explained_variance = calc_svd_basis(lbol_array_postprocess, n_coeff, svd_method=svd_method)
 
-    n, n = UA.shape
-    m, m = VA.shape
+    n = lbol_array_postprocess.shape[0]
 
     cAmat = np.zeros((n_coeff,n))
     cAvar = np.zeros((n_coeff,n))
@@ -246,6 +245,7 @@ def calc_svd_lbol(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
     svd_model["cAmat"] = cAmat
     svd_model["cAstd"] = cAstd
     svd_model["VA"] = VA
+    svd_model["explained_variance"] = explained_variance
     svd_model["param_mins"] = param_mins
     svd_model["param_maxs"] = param_maxs
     svd_model["mins"] = mins
@@ -257,10 +257,13 @@ def calc_svd_lbol(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
 
     return svd_model
 
-def calc_svd_mag(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
+def calc_svd_mag(tini,tmax,dt, n_coeff = 100, model = "BaKa2016", nprocs = None, svd_method = None):
 
     print("Calculating SVD model of lightcurve magnitudes...")
 
+    if nprocs is None:
+        nprocs = Global.nprocs
+
     if model == "BaKa2016":
         fileDir = "../output/barnes_kilonova_spectra"
     elif model == "Ka2017":
@@ -294,151 +297,17 @@ def calc_svd_mag(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
     elif model == "Bu2019rps":
         fileDir = "../output/bulla_reprocess_slim"
 
-    filenames_all = glob.glob('%s/*.dat'%fileDir)
-    idxs = []
-    for ii,filename in enumerate(filenames_all):
-        if "_Lbol.dat" in filename: continue
-        if "_spec.dat" in filename: continue
-        idxs.append(ii)
-    filenames = [filenames_all[idx] for idx in idxs]
-
-    mags, names = lightcurve_utils.read_files(filenames)
+    mags, names = lightcurve_utils.load_grid(fileDir, "mag")
     magkeys = mags.keys()
 
     tt = np.arange(tini,tmax+dt,dt)
     filters = ["u","g","r","i","z","y","J","H","K"]
 
-    for jj, key in enumerate(magkeys):
-        print('Setup %s: %d/%d' % (key, jj, len(magkeys)+1))
-        
-        keySplit = key.split("_")
-        if keySplit[0] == "rpft":
-            mej0 = float("0." + keySplit[1].replace("m",""))
-            vej0 = float("0." + keySplit[2].replace("v",""))
-            mags[key]["mej"] = mej0
-            mags[key]["vej"] = vej0
-        elif keySplit[0] == "knova":
-            mej0 = float(keySplit[3].replace("m",""))
-            vej0 = float(keySplit[4].replace("vk",""))
-            if len(keySplit) == 6:
-                Xlan0 = 10**float(keySplit[5].replace("Xlan1e",""))
-            elif len(keySplit) == 7:
-                #del mags[key]
-                #continue
-                if "Xlan1e" in keySplit[6]:
-                    Xlan0 = 10**float(keySplit[6].replace("Xlan1e",""))
-                elif "Xlan1e" in keySplit[5]:
-                    Xlan0 = 10**float(keySplit[5].replace("Xlan1e","")) 
-
-            #if (mej0 == 0.05) and (vej0 == 0.2) and (Xlan0 == 1e-3):
-            #    del mags[key]
-            #    continue
- 
-            mags[key]["mej"] = mej0
-            mags[key]["vej"] = vej0
-            mags[key]["Xlan"] = Xlan0
-        elif keySplit[0] == "SED":
-            mags[key]["mej"], mags[key]["vej"], mags[key]["Ye"] = lightcurve_utils.get_macronovae_rosswog(key)
-
-        elif "gamma" in key:
-            kappaLF = float(keySplit[2].replace("kappaLF",""))
-            gammaLF = float(keySplit[3].replace("gammaLF",""))
-            kappaLR = float(keySplit[4].replace("kappaLR",""))
-            gammaLR = float(keySplit[5].replace("gammaLR",""))
-            theta = float(keySplit[6])
-
-            mags[key]["kappaLF"] = kappaLF
-            mags[key]["gammaLF"] = gammaLF
-            mags[key]["kappaLR"] = kappaLR
-            mags[key]["gammaLR"] = gammaLR
-            mags[key]["theta"] = theta
-
-        elif "nsns" in key:
-
-            mejdyn = float(keySplit[2].replace("mejdyn",""))
-            mejwind = float(keySplit[3].replace("mejwind",""))
-            phi0 = float(keySplit[4].replace("phi",""))
-            theta = float(keySplit[5])
-
-            mags[key]["mej_dyn"] = mejdyn
-            mags[key]["mej_wind"] = mejwind
-            mags[key]["phi"] = phi0
-            mags[key]["theta"] = theta
-
-        elif "mejdyn" in key:
-
-            mejdyn = float(keySplit[1].replace("mejdyn",""))
-            mejwind = float(keySplit[2].replace("mejwind",""))
-            phi0 = float(keySplit[4].replace("phi",""))
-            theta = float(keySplit[5])
-
-            mags[key]["mej_dyn"] = mejdyn
-            mags[key]["mej_wind"] = mejwind
-            mags[key]["phi"] = phi0
-            mags[key]["theta"] = theta
-
-        elif "bluecone" in key:
-
-            mej = float(keySplit[2].replace("mej",""))
-            phi0 = float(keySplit[3].replace("th",""))
-            theta = float(keySplit[4])
-
-            mags[key]["mej"] = mej
-            mags[key]["phi"] = 90-phi0
-            mags[key]["theta"] = theta
-
-        elif "redellips" in key:
-
-            mej = float(keySplit[2].replace("mej",""))
-            a0 = float(keySplit[3].replace("a",""))
-            theta = float(keySplit[4])
-
-            mags[key]["mej"] = mej
-            mags[key]["a"] = a0
-            mags[key]["theta"] = theta
-
-        elif keySplit[0] == "nph1.0e+06":
-            #if len(keySplit) == 5:
-            #    mej0 = float(keySplit[3].replace("mej",""))
-            #    phi0 = float(keySplit[2].replace("opang",""))
-            #    T0 = float(keySplit[4].replace("T",""))
-            #elif len(keySplit) == 6:
-            #    mej0 = float(keySplit[2].replace("mej",""))
-            #    phi0 = float(keySplit[3].replace("phi",""))
-            #    T0 = float(keySplit[4].replace("T",""))
-            #    theta = float(keySplit[5])
-
-            
-            mej0 = float(keySplit[1].replace("mej",""))
-            phi0 = float(keySplit[2].replace("phi",""))
-            theta = float(keySplit[3])
-
-            mags[key]["mej"] = mej0
-            mags[key]["phi"] = phi0
-            mags[key]["theta"] = theta
-
-        elif keySplit[0] == "kasenReprocess":
-
-            mej1 = float(keySplit[2].replace("mejcone",""))
-            mej2 = float(keySplit[3].replace("mejell",""))
-            phi = float(keySplit[4].replace("th",""))
-            a = float(keySplit[5].replace("a",""))
-            theta = float(keySplit[6])
-
-            mags[key]["mej_1"] = mej1
-            mags[key]["mej_2"] = mej2
-            mags[key]["phi"] = phi
-            mags[key]["a"] = a
-            mags[key]["theta"] = theta
-
-        mags[key]["data"] = np.zeros((len(tt),len(filters)))
-
-        for jj,filt in enumerate(filters):
-            ii = np.where(np.isfinite(mags[key][filt]))[0]
-            f = interp.interp1d(mags[key]["t"][ii], mags[key][filt][ii], fill_value='extrapolate')
-            maginterp = f(tt)
-            mags[key]["data"][:,jj] = maginterp
-
+    print('Setup %d grid files' % len(magkeys))
+    magkeys = list(magkeys)
+    results = map_pool(resample_mag, [(mags[key]["t"], [mags[key][filt] for filt in filters], tt) for key in magkeys], nprocs=nprocs)
+    for key, data in zip(magkeys, results):
+        mags[key]["data"] = data
         mags[key]["data_vector"] = np.reshape(mags[key]["data"],(len(tt)*len(filters),1))
 
     magkeys = mags.keys()
@@ -488,11 +357,9 @@ def calc_svd_mag(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
         for i in range(len(mins)):
             mag_array_postprocess[:,i] = (mag_array_postprocess[:,i]-mins[i])/(maxs[i]-mins[i])
         mag_array_postprocess[np.isnan(mag_array_postprocess)]=0.0
-        UA, sA, VA = np.linalg.svd(mag_array_postprocess, full_matrices=True)
-        VA = VA.T
+        VA, explained_variance = calc_svd_basis(mag_array_postprocess, n_coeff, svd_method=svd_method)
 
-        n, n = UA.shape
-        m, m = VA.shape
+        n = mag_array_postprocess.shape[0]
 
         cAmat = np.zeros((n_coeff,n))
         cAvar = np.zeros((n_coeff,n))
@@ -519,6 +386,7 @@ def calc_svd_mag(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
         svd_model[filt]["cAmat"] = cAmat
         svd_model[filt]["cAstd"] = cAstd
         svd_model[filt]["VA"] = VA
+        svd_model[filt]["explained_variance"] = explained_variance
         svd_model[filt]["param_mins"] = param_mins
         svd_model[filt]["param_maxs"] = param_maxs
         svd_model[filt]["mins"] = mins
@@ -530,24 +398,19 @@ def calc_svd_mag(tini,tmax,dt, n_coeff = 100, model = "BaKa2016"):
 
     return svd_model
 
-def calc_svd_color_model(tini,tmax,dt, n_coeff = 100, model = "a2.0"):
+def calc_svd_color_model(tini,tmax,dt, n_coeff = 100, model = "a2.0", nprocs = None, svd_method = None):
 
     print("Calculating SVD model of inclination colors...")
 
+    if nprocs is None:
+        nprocs = Global.nprocs
+
     if model in ["DZ2","gamA2","gamB2"]:
         fileDir = "../output/wollaeger/%s" % model
     else:
         fileDir = "../output/kasen_kilonova_2D/%s" % model
 
-    filenames_all = glob.glob('%s/*.dat'%fileDir)
-    idxs = []
-    for ii,filename in enumerate(filenames_all):
-        if "_Lbol.dat" in filename: continue
-        if "_spec.dat" in filename: continue
-        idxs.append(ii)
-    filenames = [filenames_all[idx] for idx in idxs]
-
-    mags, names = lightcurve_utils.read_files(filenames)
+    mags, names = lightcurve_utils.load_grid(fileDir, "mag")
     magkeys = mags.keys()
 
     tt = np.arange(tini,tmax+dt,dt)
@@ -561,16 +424,10 @@ def calc_svd_color_model(tini,tmax,dt, n_coeff = 100, model = "a2.0"):
         else:
             mags[key]["iota"] = float(keySplit[-1])
 
-        mags[key]["data"] = np.zeros((len(tt),len(filters)))
-        for jj,filt in enumerate(filters):
-            ii = np.where(np.isfinite(mags[key][filt]))[0]
-            if len(ii) > 1:
-                f = interp.interp1d(mags[key]["t"][ii], mags[key][filt][ii], fill_value='extrapolate')
-                maginterp = f(tt)
-                mags[key]["data"][:,jj] = maginterp
-            else:
-                mags[key]["data"][:,jj] = 0.0
-
+    magkeys = list(magkeys)
+    results = map_pool(resample_mag, [(mags[key]["t"], [mags[key][filt] for filt in filters], tt) for key in magkeys], nprocs=nprocs)
+    for key, data in zip(magkeys, results):
+        mags[key]["data"] = data
         mags[key]["data_vector"] = np.reshape(mags[key]["data"],(len(tt)*len(filters),1))
 
     magkeys = mags.keys()
@@ -600,11 +457,9 @@ def calc_svd_color_model(tini,tmax,dt, n_coeff = 100, model = "a2.0"):
         for i in range(len(mins)):
             mag_array_postprocess[:,i] = (mag_array_postprocess[:,i]-mins[i])/(maxs[i]-mins[i])
         mag_array_postprocess[np.isnan(mag_array_postprocess)]=0.0
-        UA, sA, VA = np.linalg.svd(mag_array_postprocess, full_matrices=True)
-        VA = VA.T
+        VA, explained_variance = calc_svd_basis(mag_array_postprocess, n_coeff, svd_method=svd_method)
 
-        n, n = UA.shape
-        m, m = VA.shape
+        n = mag_array_postprocess.shape[0]
 
         cAmat = np.zeros((n_coeff,n))
         cAvar = np.zeros((n_coeff,n))
@@ -629,6 +484,7 @@ def calc_svd_color_model(tini,tmax,dt, n_coeff = 100, model = "a2.0"):
         svd_model[filt]["cAmat"] = cAmat
         svd_model[filt]["cAstd"] = cAstd
         svd_model[filt]["VA"] = VA
+        svd_model[filt]["explained_variance"] = explained_variance
         svd_model[filt]["param_mins"] = param_mins
         svd_model[filt]["param_maxs"] = param_maxs
         svd_model[filt]["mins"] = mins
@@ -641,10 +497,24 @@ def calc_svd_color_model(tini,tmax,dt, n_coeff = 100, model = "a2.0"):
     return svd_model
 
 
-def calc_svd_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda, n_coeff = 100, model = "BaKa2016"):
+def spec_model_filename(model, joint=None):
+    """
+    Pickle file name of the spectral SVD model of model; joint models
+    (default Global.doJointSpec) are kept apart from per-wavelength ones
+    """
+    if joint is None:
+        joint = Global.doJointSpec
+    if joint:
+        return '%s_spec_joint.pkl' % model
+    return '%s_spec.pkl' % model
+
+def calc_svd_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda, n_coeff = 100, model = "BaKa2016", nprocs = None, svd_method = None, joint = None):
 
     print("Calculating SVD model of lightcurve spectra...")
 
+    if nprocs is None:
+        nprocs = Global.nprocs
+
     if model == "BaKa2016":
         fileDir = "../output/barnes_kilonova_spectra"
     elif model == "Ka2017":
@@ -652,49 +522,16 @@ def calc_svd_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda, n_coeff = 100, mo
     elif model == "RoFe2017":
         fileDir = "../output/macronovae-rosswog_wind"
 
-    filenames = glob.glob('%s/*_spec.dat'%fileDir)
-
-    specs, names = lightcurve_utils.read_files_spec(filenames)
+    specs, names = lightcurve_utils.load_grid(fileDir, "spec")
     speckeys = specs.keys()
 
     tt = np.arange(tini,tmax+dt,dt)
     lambdas = np.arange(lambdaini,lambdamax+dlambda,dlambda)
 
-    for key in speckeys:
-        keySplit = key.split("_")
-        if keySplit[0] == "rpft":
-            mej0 = float("0." + keySplit[1].replace("m",""))
-            vej0 = float("0." + keySplit[2].replace("v",""))
-            specs[key]["mej"] = mej0
-            specs[key]["vej"] = vej0
-        elif keySplit[0] == "knova":
-            mej0 = float(keySplit[3].replace("m",""))
-            vej0 = float(keySplit[4].replace("vk",""))
-            if len(keySplit) == 6:
-                Xlan0 = 10**float(keySplit[5].replace("Xlan1e",""))
-            elif len(keySplit) == 7:
-                #del specs[key]
-                #continue
-                if "Xlan1e" in keySplit[6]:
-                    Xlan0 = 10**float(keySplit[6].replace("Xlan1e",""))
-                elif "Xlan1e" in keySplit[5]:
-                    Xlan0 = 10**float(keySplit[5].replace("Xlan1e",""))
-
-            #if (mej0 == 0.05) and (vej0 == 0.2) and (Xlan0 == 1e-3):
-            #    del specs[key]
-            #    continue
-
-            specs[key]["mej"] = mej0
-            specs[key]["vej"] = vej0
-            specs[key]["Xlan"] = Xlan0
-        elif keySplit[0] == "SED":
-            specs[key]["mej"], specs[key]["vej"], specs[key]["Ye"] = lightcurve_utils.get_macronovae_rosswog(key)
-
-        data = specs[key]["data"].T
-        data[data==0.0] = 1e-20
-        f = interp.interp2d(specs[key]["t"], specs[key]["lambda"], np.log10(data), kind='cubic')
-        #specs[key]["data"] = (10**(f(tt,lambdas))).T
-        specs[key]["data"] = f(tt,lambdas).T
+    speckeys = list(speckeys)
+    results = map_pool(resample_spec, [(specs[key]["t"], specs[key]["lambda"], specs[key]["data"], tt, lambdas) for key in speckeys], nprocs=nprocs)
+    for key, data in zip(speckeys, results):
+        specs[key]["data"] = data
 
     speckeys = specs.keys()
     param_array = []
@@ -711,6 +548,11 @@ def calc_svd_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda, n_coeff = 100, mo
     for i in range(len(param_mins)):
         param_array_postprocess[:,i] = (param_array_postprocess[:,i]-param_mins[i])/(param_maxs[i]-param_mins[i])
 
+    if joint is None:
+        joint = Global.doJointSpec
+    if joint:
+        return calc_svd_spectra_joint(specs, speckeys, param_array, param_array_postprocess, param_mins, param_maxs, tt, lambdas, n_coeff = n_coeff, svd_method = svd_method)
+
     svd_model = {}
     for jj,lambda_d in enumerate(lambdas):
         if np.mod(jj,1) == 0:
@@ -725,11 +567,9 @@ def calc_svd_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda, n_coeff = 100, mo
         for i in range(len(mins)):
             spec_array_postprocess[:,i] = (spec_array_postprocess[:,i]-mins[i])/(maxs[i]-mins[i])
         spec_array_postprocess[np.isnan(spec_array_postprocess)]=0.0
-        UA, sA, VA = np.linalg.svd(spec_array_postprocess, full_matrices=True)
-        VA = VA.T
+        VA, explained_variance = calc_svd_basis(spec_array_postprocess, n_coeff, svd_method=svd_method)
 
-        n, n = UA.shape
-        m, m = VA.shape
+        n = spec_array_postprocess.shape[0]
 
         cAmat = np.zeros((n_coeff,n))
         cAvar = np.zeros((n_coeff,n))
@@ -755,6 +595,7 @@ def calc_svd_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda, n_coeff = 100, mo
         svd_model[lambda_d]["cAmat"] = cAmat
         svd_model[lambda_d]["cAstd"] = cAstd
         svd_model[lambda_d]["VA"] = VA
+        svd_model[lambda_d]["explained_variance"] = explained_variance
         svd_model[lambda_d]["param_mins"] = param_mins
         svd_model[lambda_d]["param_maxs"] = param_maxs
         svd_model[lambda_d]["mins"] = mins
@@ -766,6 +607,56 @@ def calc_svd_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda, n_coeff = 100, mo
 
     return svd_model
 
+def calc_svd_spectra_joint(specs, speckeys, param_array, param_array_postprocess, param_mins, param_maxs, tt, lambdas, n_coeff = 100, svd_method = None):
+    """
+    Single SVD + GP bank over the flattened (time x wavelength) log10 flux
+    cube of every model, instead of one bank per wavelength bin
+    """
+
+    print("Calculating joint SVD model of lightcurve spectra...")
+
+    spec_array_postprocess = np.array([specs[key]["data"].flatten() for key in speckeys])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spec_array_postprocess[~np.isfinite(spec_array_postprocess)] = np.nan
+        mins,maxs = np.nanmin(spec_array_postprocess,axis=0),np.nanmax(spec_array_postprocess,axis=0)
+        spec_array_postprocess = (spec_array_postprocess-mins)/(maxs-mins)
+    spec_array_postprocess[np.isnan(spec_array_postprocess)]=0.0
+    VA, explained_variance = calc_svd_basis(spec_array_postprocess, n_coeff, svd_method=svd_method)
+
+    ErrorLevel = 2
+    cAmat = np.dot(VA.T,spec_array_postprocess.T)
+    cAvar = np.dot(np.power(VA,2).T,np.power(ErrorLevel*spec_array_postprocess,2).T)
+    cAstd = np.sqrt(cAvar)
+
+    kernel = 1.0 * RationalQuadratic(length_scale=1.0, alpha=0.1)
+    gps = []
+    for i in range(n_coeff):
+        if np.mod(i,5) == 0:
+            print('Coefficient %d/%d...' % (i, n_coeff))
+        gp = GaussianProcessRegressor(kernel=kernel, n_restarts_optimizer=0)
+        gp.fit(param_array_postprocess, cAmat[i,:])
+        gps.append(gp)
+
+    svd_model = {}
+    svd_model["joint"] = True
+    svd_model["n_coeff"] = n_coeff
+    svd_model["param_array"] = param_array
+    svd_model["cAmat"] = cAmat
+    svd_model["cAstd"] = cAstd
+    svd_model["VA"] = VA
+    svd_model["explained_variance"] = explained_variance
+    svd_model["param_mins"] = param_mins
+    svd_model["param_maxs"] = param_maxs
+    svd_model["mins"] = mins
+    svd_model["maxs"] = maxs
+    svd_model["gps"] = gps
+    svd_model["tt"] = tt
+    svd_model["lambda"] = lambdas
+
+    print("Finished calculating joint SVD model of lightcurve spectra...")
+
+    return svd_model
+
 def calc_color(tini,tmax,dt,param_list,svd_mag_color_model=None, model = "a2.0"):
 
     tt = np.arange(tini,tmax+dt,dt)
@@ -903,7 +794,46 @@ def calc_lc(tini,tmax,dt,param_list,svd_mag_model=None,svd_lbol_model=None, mode
 
     return np.squeeze(tt), np.squeeze(lbol), mAB
 
+def postprocess_spectra(spectra_back, tt_interp, tt, lambdas, kernel_size = 5):
+    """
+    Resample reconstructed log10 spectra of shape (nsamples, nlambda, ntimes)
+    from the model times tt_interp onto tt, median filter along wavelength
+    and fill masked wavelengths, for all samples and times at once.
+    Rows/columns with missing values fall back to the per-row interpolation.
+    """
+
+    nsamples, nlambdas, ntimes = spectra_back.shape
+    spec = np.nan*np.ones((nsamples,nlambdas,len(tt)))
+
+    good = ~np.any(np.isnan(spectra_back),axis=2)
+    jj, w = interp_weights(tt_interp, tt)
+    spec[good] = 10**(spectra_back[good][:,jj]*(1-w) + spectra_back[good][:,jj+1]*w)
+    for k, l in zip(*np.where(~good)):
+        ii = np.where(~np.isnan(spectra_back[k,l,:]))[0]
+        if len(ii) >= 2:
+            spec[k,l,:] = 10**interp_extrapolate(tt_interp[ii], spectra_back[k,l,ii], tt)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spectra_back = np.log10(spec)
+    spectra_back[~np.isfinite(spectra_back)] = -99.0
+    spectra_back[:,1:-1,:] = scipy.signal.medfilt(spectra_back,kernel_size=(1,kernel_size,1))[:,1:-1,:]
+
+    spec = 10**spectra_back
+    bad = np.any(spectra_back == 0, axis=1)
+    for k, j in zip(*np.where(bad)):
+        ii = np.where(spectra_back[k,:,j] != 0)[0]
+        if len(ii) < 2:
+            spec[k,:,j] = np.nan
+        else:
+            spec[k,:,j] = 10**interp_extrapolate(lambdas[ii], spectra_back[k,ii,j], lambdas)
+
+    return spec
+
 def calc_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda,param_list,svd_spec_model=None,model = "BaKa2016"):
+    """
+    Spectra (nlambda, ntimes) for one parameter set, or (nsamples, nlambda,
+    ntimes) for an (nsamples, nparams) array of them
+    """
 
     tt = np.arange(tini,tmax+dt,dt)
     #lambdas = np.arange(lambdaini,lambdamax+dlambda,dlambda)
@@ -911,62 +841,79 @@ def calc_spectra(tini,tmax,dt,lambdaini,lambdamax,dlambda,param_list,svd_spec_mo
 
     if svd_spec_model == None:
         svd_spec_model = calc_svd_spec(tini,tmax,dt,lambdaini,lambdamax,dlambda,model=model)
- 
-    spec = np.zeros((len(lambdas),len(tt)))
+    if "joint" in svd_spec_model:
+        return calc_spectra_joint(tini,tmax,dt,lambdaini,lambdamax,dlambda,param_list,svd_spec_model)
+
+    param_list = np.array(param_list, dtype=float)
+    single = param_list.ndim == 1
+    param_list = np.atleast_2d(param_list)
+    nsamples = param_list.shape[0]
+
+    tt_interp = svd_spec_model[lambdas[0]]["tt"]
+    spectra_back = np.zeros((nsamples,len(lambdas),len(tt_interp)))
     for jj,lambda_d in enumerate(lambdas):
         n_coeff = svd_spec_model[lambda_d]["n_coeff"]
-        param_array = svd_spec_model[lambda_d]["param_array"]
-        cAmat = svd_spec_model[lambda_d]["cAmat"]
-        cAstd = svd_spec_model[lambda_d]["cAstd"]
         VA = svd_spec_model[lambda_d]["VA"]
         param_mins = svd_spec_model[lambda_d]["param_mins"]
         param_maxs = svd_spec_model[lambda_d]["param_maxs"]
         mins = svd_spec_model[lambda_d]["mins"]
         maxs = svd_spec_model[lambda_d]["maxs"]
         gps = svd_spec_model[lambda_d]["gps"]
-        tt_interp = svd_spec_model[lambda_d]["tt"]
 
-        param_list_postprocess = np.array(param_list)
-        for i in range(len(param_mins)):
-            param_list_postprocess[i] = (param_list_postprocess[i]-param_mins[i])/(param_maxs[i]-param_mins[i])
+        param_list_postprocess = (param_list-param_mins)/(param_maxs-param_mins)
 
-        cAproj = np.zeros((n_coeff,))
+        cAproj = np.zeros((n_coeff,nsamples))
         for i in range(n_coeff):
-            gp = gps[i]
-            y_pred, sigma2_pred = gp.predict(np.atleast_2d(param_list_postprocess), return_std=True)
-            cAproj[i] = y_pred
+            cAproj[i,:] = gps[i].predict(param_list_postprocess)
 
-        spectra_back = np.dot(VA[:,:n_coeff],cAproj)
-        spectra_back = spectra_back*(maxs-mins)+mins
-        #spectra_back = scipy.signal.medfilt(spectra_back,kernel_size=3)
+        spectra_back[:,jj,:] = np.dot(VA[:,:n_coeff],cAproj).T*(maxs-mins)+mins
 
-        N  = 3    # Filter order
-        Wn = 0.1 # Cutoff frequency
-        B, A = scipy.signal.butter(N, Wn, output='ba')
-        #spectra_back = scipy.signal.filtfilt(B,A,spectra_back)
-
-        ii = np.where(~np.isnan(spectra_back))[0]
-        if len(ii) < 2:
-            specinterp = np.nan*np.ones(tt.shape)
-        else:
-            f = interp.interp1d(tt_interp[ii], spectra_back[ii], fill_value='extrapolate')
-            specinterp = 10**f(tt)
-        spec[jj,:] = specinterp
-
-    for jj, t in enumerate(tt):
-        spectra_back = np.log10(spec[:,jj])
-        spectra_back[~np.isfinite(spectra_back)] = -99.0
-        if t < 7.0:
-            spectra_back[1:-1] = scipy.signal.medfilt(spectra_back,kernel_size=5)[1:-1]
-        else:
-            spectra_back[1:-1] = scipy.signal.medfilt(spectra_back,kernel_size=5)[1:-1]
-        ii = np.where((spectra_back!=0) & ~np.isnan(spectra_back))[0] 
-        if len(ii) < 2:
-            specinterp = np.nan*np.ones(lambdas.shape)
-        else:
-            f = interp.interp1d(lambdas[ii], spectra_back[ii], fill_value='extrapolate')
-            specinterp = 10**f(lambdas)
-        spec[:,jj] = specinterp
+    spec = postprocess_spectra(spectra_back, tt_interp, tt, lambdas)
+    if single:
+        spec = spec[0]
 
     return np.squeeze(tt), np.squeeze(lambdas), spec
 
+def calc_spectra_joint(tini,tmax,dt,lambdaini,lambdamax,dlambda,param_list,svd_spec_model):
+    """
+    Spectra from a joint (time x wavelength) SVD model. param_list may be a
+    single parameter set, giving spec of shape (nlambda, ntimes), or an
+    (nsamples, nparams) array, giving (nsamples, nlambda, ntimes); all
+    samples share one GP prediction per coefficient and one reconstruction.
+    """
+
+    tt = np.arange(tini,tmax+dt,dt)
+    lambdas = np.arange(lambdaini,lambdamax,dlambda)
+
+    n_coeff = svd_spec_model["n_coeff"]
+    VA = svd_spec_model["VA"]
+    param_mins = svd_spec_model["param_mins"]
+    param_maxs = svd_spec_model["param_maxs"]
+    mins = svd_spec_model["mins"]
+    maxs = svd_spec_model["maxs"]
+    gps = svd_spec_model["gps"]
+    tt_interp = svd_spec_model["tt"]
+    lambdas_interp = svd_spec_model["lambda"]
+
+    param_list = np.array(param_list, dtype=float)
+    single = param_list.ndim == 1
+    param_list_postprocess = (np.atleast_2d(param_list)-param_mins)/(param_maxs-param_mins)
+    nsamples = param_list_postprocess.shape[0]
+
+    cAproj = np.zeros((n_coeff,nsamples))
+    for i in range(n_coeff):
+        cAproj[i,:] = gps[i].predict(param_list_postprocess)
+
+    spectra_back = np.dot(VA[:,:n_coeff],cAproj).T*(maxs-mins)+mins
+    spectra_back = spectra_back.reshape((nsamples,len(tt_interp),len(lambdas_interp)))
+
+    # linear in log10 flux onto the requested wavelengths, then the same
+    # time resampling and filtering as the per-wavelength models
+    jj, w = interp_weights(lambdas_interp, lambdas)
+    spectra_back = spectra_back[:,:,jj]*(1-w) + spectra_back[:,:,jj+1]*w
+    spec = postprocess_spectra(np.transpose(spectra_back,(0,2,1)), tt_interp, tt, lambdas)
+
+    if single:
+        spec = spec[0]
+
+    return np.squeeze(tt), np.squeeze(lambdas), spec
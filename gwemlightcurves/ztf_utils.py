@@ -1,5 +1,6 @@
 
-import os, sys, json
+import os, sys, json, time
+import asyncio
 from matplotlib import pyplot as plt
 import requests
 import numpy as np
@@ -11,188 +12,330 @@ except:
     print('Please install penquins')
     pass
 
+filtnames = {1: 'g', 2: 'r', 3: 'i'}
+
+class KowalskiBackend(object):
+    """
+    Alert queries against Kowalski, one query per batch of objects
+    """
+    def __init__(self, username, password, timeout=10, verbose=False):
+        self.k = Kowalski(username=username, password=password, verbose=verbose)
+        self.timeout = timeout
+
+    def query_objects(self, names, since=None):
+        """
+        All alerts for the objectIds in names. since is a jd, or a dict of
+        per-object jds (None for no limit), restricting to candidate.jd > since.
+        """
+        since = since_dict(names, since)
+        clauses = []
+        full = [name for name in names if since[name] is None]
+        if len(full) > 0:
+            clauses.append("{'objectId': {'$in': [%s]}}" % ", ".join(["'%s'" % name for name in full]))
+        for name in names:
+            if since[name] is not None:
+                clauses.append("{'objectId': '%s', 'candidate.jd': {'$gt': %.6f}}" % (name, since[name]))
+        selection = "{'$or': [%s]}" % ", ".join(clauses)
+        q = {"query_type": "general_search",
+             "query": "db['ZTF_alerts'].find(%s)" % selection
+             }
+        r = self.k.query(query=q, timeout=self.timeout)
+        return r['result_data']['query_result']
+
+class LocalBackend(object):
+    """
+    Stand-in for KowalskiBackend serving alerts from a list of alert
+    dictionaries or a JSON file of them, for testing and offline use.
+    latency (s) is slept per query to mimic a network round trip.
+    """
+    def __init__(self, alerts, latency=0.0):
+        if isinstance(alerts, str):
+            alerts = json.load(open(alerts))
+        self.alerts = alerts
+        self.latency = latency
+        self.nqueries = 0
+
+    def query_objects(self, names, since=None):
+        self.nqueries = self.nqueries + 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        since = since_dict(names, since)
+        return [alert for alert in self.alerts
+                if alert['objectId'] in since and
+                (since[alert['objectId']] is None or alert['candidate']['jd'] > since[alert['objectId']])]
+
+def since_dict(names, since):
+    """
+    Per-object lower jd limits from a single jd, a dict or None
+    """
+    if isinstance(since, dict):
+        return {name: since.get(name) for name in names}
+    return {name: since for name in names}
+
+def normalize_alerts(alerts):
+    """
+    Light curve (jd, filt, mag, magerr arrays sorted by jd) from the
+    candidates and prv_candidates of a list of alerts of one object.
+    Non-detections get their diffmaglim and infinite magerr; repeated
+    (jd, fid) points are kept once.
+    """
+    candidates = {}
+    for alert in alerts:
+        for candidate in [alert['candidate']] + (alert.get('prv_candidates') or []):
+            candidates[(candidate['jd'], candidate['fid'])] = candidate
+    return lightcurve_from_candidates(list(candidates.values()))
+
+def lightcurve_from_candidates(candidates):
+    jd = np.array([candidate['jd'] for candidate in candidates], dtype=float)
+    magpsf = np.array([candidate['magpsf'] for candidate in candidates], dtype=float)
+    diffmaglim = np.array([candidate.get('diffmaglim') for candidate in candidates], dtype=float)
+    sigmapsf = np.array([candidate['sigmapsf'] for candidate in candidates], dtype=float)
+    filt = np.array([filtnames.get(candidate['fid'], '') for candidate in candidates], dtype=str)
+
+    # None becomes nan in the float arrays above
+    mag = np.where(np.isnan(magpsf), diffmaglim, magpsf)
+    magerr = np.where(np.isnan(sigmapsf), np.inf, sigmapsf)
+
+    idx = np.argsort(jd, kind='stable')
+    return {"jd": jd[idx], "filt": filt[idx], "mag": mag[idx], "magerr": magerr[idx]}
+
+def merge_lightcurves(lc1, lc2):
+    """
+    Union of two normalized light curves, sorted by jd, with points of
+    lc2 replacing those of lc1 at the same (jd, filt)
+    """
+    keys = list(lc1.keys())
+    merged = {key: np.concatenate((lc1[key], lc2[key])) for key in keys}
+    codes = np.unique(merged["filt"], return_inverse=True)[1].ravel()
+    # keep the last occurrence of each (jd, filt)
+    rev = np.arange(len(codes))[::-1]
+    _, last = np.unique(np.vstack((merged["jd"][rev], codes[rev])), axis=1, return_index=True)
+    idx = np.sort(rev[last])
+    idx = idx[np.argsort(merged["jd"][idx], kind='stable')]
+    return {key: merged[key][idx] for key in keys}
+
+class AlertCache(object):
+    """
+    Normalized ZTF light curves cached on disk in cacheDir (one .npz per
+    object). update() queries the backend in batches of batch_size objects,
+    asking for each object only the alerts newer than its last cached jd, and
+    merges them into the cache. update_async() runs up to nconcurrent batch
+    queries at once.
+    """
+    def __init__(self, cacheDir, backend, batch_size=100):
+        self.cacheDir = cacheDir
+        self.backend = backend
+        self.batch_size = batch_size
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+
+    def filename(self, name):
+        return os.path.join(self.cacheDir, "%s.npz" % name)
+
+    def load(self, name):
+        filename = self.filename(name)
+        if not os.path.isfile(filename):
+            return None
+        with np.load(filename) as data:
+            return {key: data[key] for key in ["jd", "filt", "mag", "magerr"]}
+
+    def save(self, name, lc):
+        with open(self.filename(name), 'wb') as fid:
+            np.savez(fid, **lc)
+
+    def last_jd(self, name):
+        lc = self.load(name)
+        if lc is None or len(lc["jd"]) == 0:
+            return None
+        return np.max(lc["jd"])
+
+    def batches(self, names):
+        return [names[ii:ii+self.batch_size] for ii in range(0, len(names), self.batch_size)]
+
+    def since(self, names):
+        """
+        Last cached jd of each object (None if nothing is cached yet), so
+        uncached objects do not force a full query for the whole batch
+        """
+        return {name: self.last_jd(name) for name in names}
+
+    def ingest(self, names, alerts):
+        """
+        Merge the alerts returned for names into the cache
+        """
+        grouped = {name: [] for name in names}
+        for alert in alerts:
+            if alert['objectId'] in grouped:
+                grouped[alert['objectId']].append(alert)
+
+        lcs = {}
+        for name in names:
+            lc = self.load(name)
+            if len(grouped[name]) > 0:
+                new = normalize_alerts(grouped[name])
+                lc = new if lc is None else merge_lightcurves(lc, new)
+                self.save(name, lc)
+            lcs[name] = lc
+        return lcs
+
+    def update(self, names):
+        """
+        Refresh names from the backend; returns their light curves (None
+        for objects without any alerts)
+        """
+        lcs = {}
+        for batch in self.batches(list(names)):
+            alerts = self.backend.query_objects(batch, since=self.since(batch))
+            lcs.update(self.ingest(batch, alerts))
+        return lcs
+
+    async def update_async(self, names, nconcurrent=4):
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(nconcurrent)
+
+        async def update_batch(batch):
+            async with semaphore:
+                alerts = await loop.run_in_executor(None, self.backend.query_objects, batch, self.since(batch))
+            return self.ingest(batch, alerts)
+
+        results = await asyncio.gather(*[update_batch(batch) for batch in self.batches(list(names))])
+        lcs = {}
+        for result in results:
+            lcs.update(result)
+        return lcs
+
+    def get(self, names, refresh=True):
+        """
+        Light curves for names, refreshing them first unless refresh=False
+        """
+        if refresh:
+            return self.update(names)
+        return {name: self.load(name) for name in names}
+
 def get_ztf(filename, name, username, password,
-            filetype = "default", z=0.0, zerr=0.0001, SN_Type="Ia"):
-
-    k = Kowalski(username=username, password=password, verbose=True)
-
-    q = {"query_type": "general_search",
-     "query": "db['ZTF_alerts'].find({'objectId': {'$eq': '"+name+"'}})"
-     }
-    r = k.query(query=q,timeout=10)
-    if len(r['result_data']['query_result']) >0:
-        candidate = r['result_data']['query_result'][0]
-        prevcandidates= r['result_data']['query_result'][0]['prv_candidates']
-
-        print(candidate,prevcandidates)
-
-        jd = [candidate['candidate']['jd']]
-        mag = [candidate['candidate']['magpsf']]
-        magerr = [candidate['candidate']['sigmapsf']]
-        filt = [candidate['candidate']['fid']]
-
-        for candidate in prevcandidates:
-            jd.append(candidate['jd'])
-            if not candidate['magpsf'] == None:
-                mag.append(candidate['magpsf'])
-            else:
-                mag.append(candidate['diffmaglim'])
-            if not candidate['sigmapsf'] == None:
-                magerr.append(candidate['sigmapsf'])
-            else:
-                magerr.append(np.inf)
-
-            filt.append(candidate['fid'])
-        filtname = []
-        for f in filt:
-            if f == 1:
-                filtname.append('g')
-            elif f == 2:
-                filtname.append('r')
-            elif f == 3:
-                filtname.append('i')
-    idx = np.argsort(jd)
+            filetype = "default", z=0.0, zerr=0.0001, SN_Type="Ia",
+            cacheDir=None, backend=None):
+    """
+    Write (or return, filetype="lc") the ZTF light curve of name. With
+    cacheDir, alerts are cached there and only newer ones are queried.
+    """
+
+    if backend is None:
+        backend = KowalskiBackend(username, password, verbose=True)
+
+    if cacheDir is not None:
+        lc = AlertCache(cacheDir, backend).update([name])[name]
+    else:
+        alerts = backend.query_objects([name])
+        lc = normalize_alerts(alerts) if len(alerts) > 0 else None
+
+    if lc is None:
+        print('No alerts found for %s' % name)
+        return
+
+    jd, filtname, mag, magerr = lc["jd"], lc["filt"], lc["mag"], lc["magerr"]
+    mjds = Time(jd, format='jd').mjd
+    flux = 10**((mag+48.60)/(-2.5))
+    fluxerr = magerr*flux
 
     if filetype == "lc":
-        mjds, fluxs, fluxerrs, passband = [], [], [], []
-        for ii in idx:
-            t = Time(jd[ii], format='jd').mjd
-            flux = 10**((mag[ii]+48.60)/(-2.5))
-            fluxerr = magerr[ii]*flux
-            mjds.append(t)
-            fluxs.append(flux)
-            fluxerrs.append(fluxerr)
-            passband.append(filtname[ii])
-        return mjds, fluxs, fluxerrs, passband
+        return list(mjds), list(flux), list(fluxerr), list(filtname)
 
     fid = open(filename,'w')
     if filetype == "default":
-        for ii in idx:
-            t = Time(jd[ii], format='jd').isot
-            fid.write('%s %s %.5f %.5f\n'%(t,filtname[ii],mag[ii],magerr[ii]))
+        isots = Time(jd, format='jd').isot
+        for ii in range(len(jd)):
+            fid.write('%s %s %.5f %.5f\n'%(isots[ii],filtname[ii],mag[ii],magerr[ii]))
     elif filetype == "snmachine":
         fid.write('HOST_GALAXY_PHOTO-Z:   %.4f  +- %.4f\n'%(z,zerr))
         fid.write('SIM_COMMENT:  SN Type = %s\n'%SN_Type)
-        for ii in idx:
-            t = Time(jd[ii], format='jd').mjd
-            flux = 10**((mag[ii]+48.60)/(-2.5))
-            fluxerr = magerr[ii]*flux
-            fid.write('OBS: %.3f %s NULL %.3e %.3e %.2f %.5f %.5f\n'%(t,filtname[ii],flux,fluxerr,flux/fluxerr,mag[ii],magerr[ii]))
+        for ii in range(len(jd)):
+            fid.write('OBS: %.3f %s NULL %.3e %.3e %.2f %.5f %.5f\n'%(mjds[ii],filtname[ii],flux[ii],fluxerr[ii],flux[ii]/fluxerr[ii],mag[ii],magerr[ii]))
     fid.close()
 
+def parse_growth_lc(text, programids=None):
+    """
+    Detections (jd, filt, mag, magerr arrays) from the print_lc.cgi
+    response: positive P48+ZTF and P60+SEDM subtractions, optionally only
+    from the given programids
+    """
+    lines = text.replace(" ","").replace("\n","").replace('"','').split("isdiffpos")[-1].split("<br>")
+    rows = [list(filter(None,line.split(",")))[:13] for line in lines]
+    # 12 column rows have no absmag
+    rows = [row[:3] + ["NaN"] + row[3:] if len(row) == 12 else row for row in rows]
+    rows = [row for row in rows if len(row) == 13]
+
+    columns = np.array(rows, dtype=str).reshape((-1,13))
+    jdobs, filt, magpsf, sigmamagpsf = columns[:,1], columns[:,2], columns[:,4], columns[:,5]
+    instrument, programid, isdiffpos = columns[:,7], columns[:,8], columns[:,12]
+
+    keep = np.isin(instrument, ["P48+ZTF","P60+SEDM"]) & (isdiffpos == "True")
+    if programids is not None:
+        keep = keep & np.isin(programid, [str(programid) for programid in programids])
+
+    jd = jdobs[keep].astype(float)
+    mag = magpsf[keep].astype(float)
+    magerr = sigmamagpsf[keep].astype(float)
+    filt = filt[keep]
+
+    # do not include undetected points (magpsf of 99 or below -100)
+    detected = (mag >= -100) & ~np.isclose(mag, 99.0)
+    return jd[detected], filt[detected], mag[detected], magerr[detected]
+
 def get_ztf_lc(filename, name, username, password,
                filetype = "default", z=0.0, zerr=0.0001, SN_Type="Ia",
                programids=None):
 
     r = requests.post('http://skipper.caltech.edu:8080/cgi-bin/growth/print_lc.cgi', auth=(username, password), data={'name' : name})
 
-    lines = r.text.replace(" ","").replace("\n","").replace('"','').split("isdiffpos")[-1].split("<br>")
-    jd, filtname, mag, magerr = [], [], [], []
-    
-    for line in lines:
-        lineSplit = line.split(",")
-        lineSplit = list(filter(None,lineSplit))
-        if not lineSplit: continue
-        if len(lineSplit) > 13:
-            lineSplit = lineSplit[:13]
-
-        if len(lineSplit) == 12:
-            date,jdobs,filt,magpsf,sigmamagpsf,limmag,instrument,programid,reducedby,refsys,issub,isdiffpos = lineSplit
-        else:
-            print(lineSplit)
-            date,jdobs,filt,absmag,magpsf,sigmamagpsf,limmag,instrument,programid,reducedby,refsys,issub,isdiffpos = lineSplit
-        if programids is not None:
-            if programid == "None": continue
-            if not int(programid) in programids:
-                continue
-
-        if not instrument in ["P48+ZTF","P60+SEDM"]: continue
-
-        if not isdiffpos == "True":
-            continue
-
-        if float(magpsf) < -100:
-            magpsf = "99.0"
-        if float(limmag) < -100:
-            limmag = "99.0"
-
-        # do not include undetected points after first detection
-        if np.isclose(float(magpsf),99.0):
-            continue
-
-        jd.append(float(jdobs))
-        filtname.append(filt)
-
-        if np.isclose(float(magpsf),99.0):
-            mag.append(float(limmag))
-            magerr.append(np.inf)
-        else:
-            mag.append(float(magpsf))
-            magerr.append(float(sigmamagpsf))
-
-    if len(jd) == 0:
-        return mjds, mag, magerr, fluxs, fluxerrs, passband
-
+    jd, filtname, mag, magerr = parse_growth_lc(r.text, programids=programids)
     idx = np.argsort(jd)
 
     zeropoint = 26.2
     if filetype == "lc":
-        mjds, fluxs, fluxerrs, passband = [], [], [], []
-        for ii in idx:
-            t = Time(jd[ii], format='jd').mjd
-            flux = 10. ** (-0.4 * (mag[ii] - zeropoint))
-            fluxerr = np.abs(flux * magerr[ii] * (np.log(10.) / 2.5))
-            mjds.append(t)
-            fluxs.append(flux)
-            fluxerrs.append(fluxerr)
-            passband.append(filtname[ii])
+        if len(jd) == 0:
+            return np.array([]), mag, magerr, np.array([]), np.array([]), filtname
+
+        mjds = Time(jd[idx], format='jd').mjd
+        mag, magerr, passband = mag[idx], magerr[idx], filtname[idx]
+        fluxs = 10. ** (-0.4 * (mag - zeropoint))
+        fluxerrs = np.abs(fluxs * magerr * (np.log(10.) / 2.5))
 
         passbands = list(set(passband))
         ncounts = {}
         nmax, filtmax = -1, 'n'
         for filt in passbands:
-            ncounts[filt] = 0
-            for thisfilt in passband:
-                if thisfilt == filt:
-                    ncounts[filt] += 1
+            ncounts[filt] = np.sum(passband == filt)
             if nmax < ncounts[filt]:
                 nmax = ncounts[filt]*1.0
                 filtmax = filt
 
-        t0 = mjds[0]
+        # flat padding 14 days before the first and after the last point
         dts = np.arange(-14,0,0.5)
-        for filt in passbands:
-            for dt in dts:
-                flux = 1.0
-                fluxerr = 1.0
-                mjds.append(t0+dt)
-                mag.append(zeropoint)
-                magerr.append(1.0)
-                fluxs.append(flux)
-                fluxerrs.append(fluxerr)
-                passband.append(filt) 
-
-        t0 = np.max(mjds)
+        t0 = mjds[0]
+        pad_before = t0 + np.tile(dts, len(passbands))
         dts = np.arange(0,14,0.5)
-        for filt in passbands:
-            for dt in dts:
-                flux = 1.0
-                fluxerr = 1.0
-                mjds.append(t0+dt)
-                mag.append(zeropoint)
-                magerr.append(1.0)
-                fluxs.append(flux)
-                fluxerrs.append(fluxerr)
-                passband.append(filt)
-            
+        t0 = np.max(mjds)
+        pad_after = t0 + np.tile(dts, len(passbands))
+        pad_passband = np.repeat(passbands, len(dts))
+        npad = 2*len(pad_before)
+
+        mjds = np.concatenate((mjds, pad_before, pad_after))
+        mag = np.concatenate((mag, zeropoint*np.ones(npad)))
+        magerr = np.concatenate((magerr, np.ones(npad)))
+        fluxs = np.concatenate((fluxs, np.ones(npad)))
+        fluxerrs = np.concatenate((fluxerrs, np.ones(npad)))
+        passband = np.concatenate((passband, pad_passband, pad_passband))
+
         idx = np.argsort(mjds)
-        mjds = np.array(mjds)[idx]
-        mag = np.array(mag)[idx]
-        magerr = np.array(magerr)[idx]
-        fluxs = np.array(fluxs)[idx]
-        fluxerrs = np.array(fluxerrs)[idx]
-        passband = np.array(passband)[idx]   
+        mjds = mjds[idx]
+        mag = mag[idx]
+        magerr = magerr[idx]
+        fluxs = fluxs[idx]
+        fluxerrs = fluxerrs[idx]
+        passband = passband[idx]
 
+        # drop sparsely sampled filters
         idx = np.empty((0,1))
         for filt in passbands:
             if ncounts[filt] < nmax/4.0:
@@ -228,22 +371,21 @@ def get_ztf_lc(filename, name, username, password,
 
         return mjds, mag, magerr, fluxs, fluxerrs, passband 
 
+    jd, filtname, mag, magerr = jd[idx], filtname[idx], mag[idx], magerr[idx]
     fid = open(filename,'w')
     if filetype == "default":
-        for ii in idx:
-            t = Time(jd[ii], format='jd').isot
-            fid.write('%s %s %.5f %.5f\n'%(t,filtname[ii],mag[ii],magerr[ii]))
+        isots = Time(jd, format='jd').isot if len(jd) > 0 else []
+        for ii in range(len(jd)):
+            fid.write('%s %s %.5f %.5f\n'%(isots[ii],filtname[ii],mag[ii],magerr[ii]))
     elif filetype == "snmachine":
         fid.write('HOST_GALAXY_PHOTO-Z:   %.4f  +- %.4f\n'%(z,zerr))
         fid.write('SIM_COMMENT:  SN Type = %s\n'%SN_Type)
-        for ii in idx:
-            t = Time(jd[ii], format='jd').mjd
-            flux = 10**((mag[ii]+48.60)/(-2.5))
-            fluxerr = magerr[ii]*flux
-            if np.isclose(fluxerr,0.0,atol=1e-12):
-                snr = np.inf
-            else:
-                snr = flux/fluxerr
+        mjds = Time(jd, format='jd').mjd if len(jd) > 0 else []
+        flux = 10**((mag+48.60)/(-2.5))
+        fluxerr = magerr*flux
+        with np.errstate(divide='ignore'):
+            snr = np.where(np.isclose(fluxerr,0.0,atol=1e-12), np.inf, flux/fluxerr)
+        for ii in range(len(jd)):
             if not np.isfinite(magerr[ii]): continue
-            fid.write('OBS: %.3f %s NULL %.3e %.3e %.2f %.5f %.5f\n'%(t,filtname[ii],flux,fluxerr,snr,mag[ii],magerr[ii]))
+            fid.write('OBS: %.3f %s NULL %.3e %.3e %.2f %.5f %.5f\n'%(mjds[ii],filtname[ii],flux[ii],fluxerr[ii],snr[ii],mag[ii],magerr[ii]))
     fid.close()
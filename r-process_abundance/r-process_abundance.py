@@ -96,6 +96,7 @@ import matplotlib
 import h5py
 from cycler import cycler
 from scipy import stats
+from scipy import ndimage
 
 params = {'legend.fontsize': 'x-large',
          'axes.labelsize': 'x-large',
@@ -124,11 +125,9 @@ plt.xlabel('Redshift')
 
 from scipy import interpolate
 from scipy import integrate
+import rprocess_density
 
-def E_of_z(z):
-    O_M = 0.308
-    O_L = 1.-O_M
-    return np.sqrt(O_M*np.power(1.+z,3)+O_L)
+E_of_z = rprocess_density.E_of_z
 
 # just use the lower limit rate for now and then we can multiply by a factor to get the upper limits
 R_of_z = interpolate.interp1d(z_mer, rate_density_low)
@@ -175,16 +174,12 @@ rate_loc = (np.log10(R_high) + np.log10(R_low))/2.
 # then divide by 1.64 to go from 1.64 standard deviations to 1.
 rate_sig = (np.log10(R_high) - np.log10(R_low))/2./1.64 
 
-def R_of_z_MD(z):
-    return 0.015*np.divide(np.power(1.+z,2.7),(1.+np.power((1.+z)/2.9,5.6)))
+R_of_z_MD = rprocess_density.R_of_z_MD
 
 R_of_0 = R_of_z_MD(0)
 
 # set M_ej = 1 here and then can scale later!
-def integrand(z):
-    return 14e9*R_of_z_MD(z)*1./((1.+z)*E_of_z(z))
-
-density_scaled = integrate.quad(integrand,min(z_mer),max(z_mer))[0]
+density_scaled = rprocess_density.get_rho_avg(min(z_mer),max(z_mer))
 
 for Mi,M_ej_sample in enumerate(M_ej_samples):
     rate_sample = np.power(10.,np.random.normal(loc=rate_loc, scale=rate_sig))
@@ -329,33 +324,20 @@ plt.savefig('plots/r_process_X_hist.png',dpi=400)
 
 # In[97]:
 
-t_h = 14.42e3 #hubble time, Myr
-def t_of_z_integrand(z):
-    return t_h/((1.+z)*E_of_z(z))
 z_list = np.linspace(0.,19.,1000)
-t_list = []
-for zi,z in enumerate(z_list):
-    myt = integrate.quad(t_of_z_integrand,1000.,z)
-    t_list.append(-myt[0])
+t_list = rprocess_density.t_of_z(z_list)
 
 plt.plot(z_list,t_list)
 
-z_of_t = interpolate.interp1d(t_list[::-1],z_list[::-1], bounds_error=False,fill_value='extrapolate')
-t_of_z = interpolate.interp1d(z_list,t_list,bounds_error=False,fill_value='extrapolate')
-
 
 # In[98]:
 
-t_linear = np.linspace(10.,max(t_list),int((max(t_list)-10.)/10.))
+# SFR convolved with the delay time distribution, computed once and reused below
+t_linear, convolution = rprocess_density.get_delay_convolution(z_list)
 print max(t_list)
-R_of_t_MD = R_of_z_MD(z_of_t(t_linear))
-delay_times = np.array([1./t for t in t_linear])/np.sum([1./t for t in t_linear])
+R_of_t_MD = R_of_z_MD(np.interp(t_linear, t_list[::-1], z_list[::-1]))
+delay_times = (1./t_linear)/np.sum(1./t_linear)
 print delay_times[0]
-convolution = np.zeros_like(R_of_t_MD)
-vect_len = len(R_of_t_MD)
-for ri,R in enumerate(R_of_t_MD):
-    convolution[ri:] = convolution[ri:] + R*delay_times[:vect_len-ri]
-#convolution = np.convolve(R_of_t_MD,delay_times)
 plt.plot(t_linear,convolution,label='delay times')
 plt.plot(t_linear,R_of_t_MD,label='sfr')
 plt.plot(t_linear,200.*delay_times,label='delay time')
@@ -393,13 +375,10 @@ keylist = ['H4','MPA1','SLY','AP4']
 namelist = ['H4','MPA1','SLy','APR4']
 #keylist = ['MS1','H4','SLY']
 # make a new total density that can then be scaled appropriately:
-density_scaled = 1e6*np.diff(t_linear)[0]*np.sum(convolution)/convolution[-1] # 1e6 needed to go from t_linear in Myr to yr
+density_scaled = rprocess_density.get_density_scale(t_linear, convolution)
 
 # get the average rho from integrating star formation rate
-def integrand(z):
-    return 14e9*R_of_z_MD(z)*1./((1.+z)*E_of_z(z))
-
-rho_avg = integrate.quad(integrand,min(z_mer),max(z_mer))[0] # M_solar per Mpc^3
+rho_avg = rprocess_density.get_rho_avg(min(z_mer),max(z_mer)) # M_solar per Mpc^3
 rho_avg_log = np.log10(rho_avg)
 
 rate_sample_npz= np.load('samples/chains_union.npz')
@@ -413,27 +392,19 @@ for fi,filename in enumerate(filenames):
     minLL = 100000
     maxUL = -100000
     for k,key in enumerate(keylist):
-        density_samples = []
         data = f[key]
-        ejecta_key = data.keys()[19]
-        ejecta_masses = np.log10(np.array(list(data[ejecta_key])))
-    #samples = np.genfromtxt(filenames[ri],names=True)
-    #M_ej_samples = np.log10(samples['Mej'])
-        for Mi,M_ej_sample in enumerate(ejecta_masses):
-            density_sample = density_scaled*np.power(10.,M_ej_sample)*np.random.choice(rate_samples,5000)
-            density_samples.extend(density_sample)
-        density_samples = np.array(density_samples)/1e9 # now in units of M_solar Mpc^-3
+        ejecta_key = list(data.keys())[19]
+        ejecta_masses = np.array(data[ejecta_key])
+        # log10 density (M_solar Mpc^-3) of every ejecta sample x 5000 rate draws, as a histogram
+        bins, counts = rprocess_density.density_histogram(ejecta_masses, rate_samples, density_scaled, nrate=5000)
         plt.figure(1)
-        sns.kdeplot(np.log10(density_samples)[density_samples>0],bw=0.24,lw=2,label=namelist[k],color=mycolors[k],ls='-')
-        kernel = stats.gaussian_kde(np.log10(density_samples)[density_samples>0],bw_method=0.24)
-        resamples = kernel.resample(100000)
-        resamples = resamples.reshape(-1)
-        quantile = len(resamples[(resamples-rho_avg_log)<=-7])/float(len(resamples))
-        LL = np.percentile(resamples,5)
-        UL = np.percentile(resamples,95)
+        # smoothed with the 0.24 dex bandwidth of the KDE previously used here
+        pdf = ndimage.gaussian_filter1d(counts/(np.sum(counts)*np.diff(bins)), 0.24/np.diff(bins)[0])
+        plt.plot(bins[:-1]+np.diff(bins)/2.,pdf,lw=2,label=namelist[k],color=mycolors[k],ls='-')
+        quantile = rprocess_density.histogram_fraction_below(bins, counts, rho_avg_log-7)
+        LL, median, UL = rprocess_density.histogram_quantiles(bins, counts, [0.05,0.5,0.95])
         minLL = min([LL,minLL])
         maxUL = max([UL,maxUL])
-        median = np.percentile(resamples,50)
         print quantile,LL-rho_avg_log,UL-rho_avg_log
 #         cdf = []
 #         cdf_mej = np.linspace(-10.,10.,1000)
@@ -483,7 +454,7 @@ plt.savefig('plots/r_process_density_and_X.png',dpi=400)
 
 
 
-plt.hist(np.log10(density_samples/rho_avg))
+plt.step(bins[:-1]-rho_avg_log,counts,where='post')
 plt.xlabel(r'$\mathrm{log}({\frac{\rho_\mathrm{r-process}}{f_\mathrm{rp}}} (\mathrm{M}_\odot \mathrm{Mpc}^{-3}))$',fontsize=14)
 
 
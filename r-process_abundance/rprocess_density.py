@@ -0,0 +1,108 @@
+
+# Population r-process density from ejecta mass and BNS rate posteriors.
+#
+# The redshift-integrated rate, with a t^-1 delay-time distribution convolved
+# with the Madau & Dickinson (2014) star formation rate, is computed once on a
+# time grid (get_density_scale). Densities for every (ejecta sample, rate
+# sample) pair are then a product density_scale*M_ej*R, so their distribution
+# is accumulated as a histogram of log10 density in chunks of ejecta samples
+# (density_histogram), with quantiles read off its cumulative sum. Values
+# beyond the bin range are kept in the edge bins, so quantiles inside the
+# range are normalised by the total number of draws.
+
+import numpy as np
+from scipy import integrate
+
+t_h = 14.42e3 # Hubble time, Myr
+
+def E_of_z(z, O_M=0.308):
+    O_L = 1.-O_M
+    return np.sqrt(O_M*np.power(1.+z,3)+O_L)
+
+def R_of_z_MD(z):
+    """
+    Madau & Dickinson (2014) star formation rate, M_solar / yr / Mpc^3
+    """
+    return 0.015*np.divide(np.power(1.+z,2.7),(1.+np.power((1.+z)/2.9,5.6)))
+
+def t_of_z(z, zmax=1000., nu=100000):
+    """
+    Cosmic time (Myr) at redshift z, integrating t_h/((1+z)E(z)) from zmax
+    down to z on a grid in ln(1+z)
+    """
+    u = np.linspace(0., np.log(1.+zmax), nu)
+    integrand = t_h/E_of_z(np.exp(u)-1.)
+    # cumulative integral from u to ln(1+zmax)
+    t_grid = np.hstack((np.cumsum(((integrand[1:]+integrand[:-1])/2.*np.diff(u))[::-1])[::-1],0.))
+    return np.interp(np.log(1.+np.asarray(z)), u, t_grid)
+
+def get_delay_convolution(z_list=np.linspace(0.,19.,1000), tmin=10., dt=10.):
+    """
+    Star formation rate convolved with a t^-1 delay-time distribution
+    (tmin to the age of the universe), on a linear cosmic time grid (Myr).
+    Returns t_linear and the un-normalized merger rate density.
+    """
+    t_list = t_of_z(z_list)
+    t_linear = np.linspace(tmin,np.max(t_list),int((np.max(t_list)-tmin)/dt))
+    z_of_t = np.interp(t_linear, t_list[::-1], z_list[::-1])
+    R_of_t_MD = R_of_z_MD(z_of_t)
+
+    delay_times = (1./t_linear)/np.sum(1./t_linear)
+    convolution = np.convolve(R_of_t_MD, delay_times)[:len(t_linear)]
+
+    return t_linear, convolution
+
+def get_density_scale(t_linear, convolution):
+    """
+    r-process density today (M_solar / Gpc^3) per unit ejecta mass (M_solar)
+    and unit local rate (Gpc^-3 yr^-1), from the output of get_delay_convolution
+    """
+    # 1e6 to go from t_linear in Myr to yr
+    return 1e6*np.diff(t_linear)[0]*np.sum(convolution)/convolution[-1]
+
+def get_rho_avg(zmin=0., zmax=19.):
+    """
+    Average density (M_solar / Mpc^3) from integrating the star formation rate
+    """
+    def integrand(z):
+        return 14e9*R_of_z_MD(z)*1./((1.+z)*E_of_z(z))
+    return integrate.quad(integrand,zmin,zmax)[0]
+
+def density_histogram(ejecta_masses, rate_samples, density_scale, bins=np.linspace(-4.,8.,1201), nrate=5000, chunk=1000, seed=None):
+    """
+    Histogram of log10 r-process density (M_solar / Mpc^3) over all ejecta
+    samples, each paired with nrate rates drawn with replacement from
+    rate_samples. Ejecta samples are processed chunk at a time, so memory
+    is bounded by chunk*nrate. Non-positive masses are skipped; densities
+    outside the bins are counted in the first or last bin, so the counts
+    always sum to the number of draws.
+    """
+    rng = np.random.RandomState(seed)
+    ejecta_masses = np.asarray(ejecta_masses, dtype=float)
+    ejecta_masses = ejecta_masses[ejecta_masses > 0]
+    log_rates = np.log10(rate_samples)
+    offset = np.log10(density_scale/1e9)
+
+    counts = np.zeros(len(bins)-1)
+    for start in range(0, len(ejecta_masses), chunk):
+        log_mej = np.log10(ejecta_masses[start:start+chunk])
+        draws = log_rates[rng.randint(0, len(log_rates), size=(len(log_mej),nrate))]
+        log_density = np.clip(offset + log_mej[:,np.newaxis] + draws, bins[0], bins[-1])
+        counts += np.histogram(log_density, bins=bins)[0]
+
+    return bins, counts
+
+def histogram_quantiles(bins, counts, q):
+    """
+    Quantiles q (in [0, 1]) of a histogram, interpolating within bins
+    """
+    cdf = np.hstack((0.,np.cumsum(counts)))
+    cdf = cdf/cdf[-1]
+    return np.interp(q, cdf, bins)
+
+def histogram_fraction_below(bins, counts, value):
+    """
+    Fraction of a histogram below value
+    """
+    cdf = np.hstack((0.,np.cumsum(counts)))
+    return np.interp(value, bins, cdf/cdf[-1])